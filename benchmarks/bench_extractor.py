@@ -0,0 +1,57 @@
+"""
+Benchmark of the reference extraction from text: the full URL_REGEX at
+every position (`re.findall`, as before), the prefiltered url matcher, and
+the single pass over all reference kinds.
+
+    $ python benchmarks/bench_extractor.py [pdf ...]
+
+Without arguments, the text of `tests/pdfs/valid.pdf` is used. The text is
+repeated to about 10 MB.
+"""
+from __future__ import absolute_import, division, print_function
+
+import os
+import re
+import sys
+import time
+
+import pdfx
+from pdfx import extractor
+
+curdir = os.path.dirname(os.path.realpath(__file__))
+
+TEXT_SIZE = 10 * 1024 * 1024
+
+
+def bench(func, text, repeat=3):
+    """ Returns the best time of `repeat` runs and the result """
+    best = None
+    for _ in range(repeat):
+        t = time.time()
+        result = func(text)
+        elapsed = time.time() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    fns = sys.argv[1:] or [os.path.join(curdir, "..", "tests", "pdfs", "valid.pdf")]
+    text = "".join(pdfx.PDFx(fn).get_text() for fn in fns)
+    text = text * max(1, TEXT_SIZE // max(len(text), 1))
+    print("Text: %s MB\n" % (len(text) // (1024 * 1024)))
+
+    t_regex, urls_regex = bench(lambda t: set(re.findall(extractor.URL_REGEX, t)), text)
+    t_urls, urls = bench(extractor.extract_urls, text)
+    assert urls == urls_regex
+
+    t_refs, refs = bench(lambda t: set(m.ref for m in extractor.extract_references(t)), text)
+
+    print("%-28s %10s %8s" % ("", "time [s]", "matches"))
+    print("%-28s %10.3f %8s" % ("URL_REGEX (re.findall)", t_regex, len(urls_regex)))
+    print("%-28s %10.3f %8s" % ("extract_urls (prefiltered)", t_urls, len(urls)))
+    print("%-28s %10.3f %8s" % ("extract_references", t_refs, len(refs)))
+    print("\nSpeedup of url matching: %.1fx" % (t_regex / t_urls))
+
+
+if __name__ == "__main__":
+    main()
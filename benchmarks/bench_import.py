@@ -0,0 +1,56 @@
+"""
+Benchmark of the startup time: `import pdfx`, `import pdfx.cli` (with
+`python -X importtime`) and running `pdfx --version`.
+
+    $ python benchmarks/bench_import.py [runs]
+
+Prints the best time of `runs` fresh interpreters, and the slowest modules
+imported by `pdfx.cli`.
+"""
+from __future__ import absolute_import, division, print_function
+
+import sys
+import time
+import subprocess
+
+
+def get_import_times(module):
+    """ Returns `{module: (self_us, cumulative_us)}` of importing `module` in a new interpreter """
+    cmd = [sys.executable, "-X", "importtime", "-c", "import %s" % module]
+    stderr = subprocess.run(cmd, stderr=subprocess.PIPE, check=True).stderr.decode()
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")  # noqa: E203
+        if self_us.strip().isdigit():
+            times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def best_of(runs, func):
+    return min(func() for _ in range(runs))
+
+
+def time_version():
+    t = time.time()
+    cmd = [sys.executable, "-m", "pdfx.cli", "--version"]
+    subprocess.run(cmd, stdout=subprocess.PIPE, check=True)
+    return time.time() - t
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for module in ["pdfx", "pdfx.cli"]:
+        t = best_of(runs, lambda: get_import_times(module)[module][1])
+        print("import %-10s %8.1f ms" % (module, t / 1000))
+    print("pdfx --version    %8.1f ms" % (best_of(runs, time_version) * 1000))
+
+    times = get_import_times("pdfx.cli")
+    print("\nSlowest modules (cumulative):")
+    for name, (_, cumulative) in sorted(times.items(), key=lambda item: -item[1][1])[:10]:
+        print("  %-40s %8.1f ms" % (name, cumulative / 1000))
+
+
+if __name__ == "__main__":
+    main()
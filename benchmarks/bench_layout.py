@@ -0,0 +1,47 @@
+"""
+Benchmark of the reference extraction with and without layout analysis.
+
+    $ python benchmarks/bench_layout.py [pdf ...]
+
+Without arguments, the PDFs in `tests/pdfs/` are used.
+"""
+from __future__ import absolute_import, division, print_function
+
+import os
+import sys
+import glob
+import time
+
+import pdfx
+
+curdir = os.path.dirname(os.path.realpath(__file__))
+
+
+def bench(fn, layout, repeat=3):
+    """ Returns the best time of `repeat` runs and the number of references """
+    best = None
+    for _ in range(repeat):
+        t = time.time()
+        refs = pdfx.PDFx(fn, layout=layout).get_references()
+        elapsed = time.time() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(refs)
+
+
+def main():
+    fns = sys.argv[1:] or sorted(glob.glob(os.path.join(curdir, "..", "tests", "pdfs", "*.pdf")))
+    print("%-20s %12s %12s %8s %6s" % ("pdf", "normal [s]", "none [s]", "speedup", "refs"))
+    for fn in fns:
+        try:
+            t_normal, n_refs = bench(fn, "normal")
+            t_none, n_refs_none = bench(fn, "none")
+        except pdfx.exceptions.PDFInvalidError:
+            continue
+        print(
+            "%-20s %12.3f %12.3f %7.1fx %6s"
+            % (os.path.basename(fn), t_normal, t_none, t_normal / t_none, n_refs_none)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark of reading the metadata with `pdfx.read_metadata`, which does not
+interpret any page, against the full extraction (`PDFx.summary`).
+
+    $ python benchmarks/bench_metadata.py [pdf ...]
+
+Without arguments, the PDFs in `tests/pdfs/` are used.
+"""
+from __future__ import absolute_import, division, print_function
+
+import os
+import sys
+import glob
+import time
+
+import pdfx
+
+curdir = os.path.dirname(os.path.realpath(__file__))
+
+
+def bench(func, fn, repeat=3):
+    """ Returns the best time of `repeat` runs of `func(fn)` and its result """
+    best = None
+    for _ in range(repeat):
+        t = time.time()
+        result = func(fn)
+        elapsed = time.time() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def read_summary(fn):
+    return pdfx.PDFx(fn).summary["metadata"]
+
+
+def main():
+    fns = sys.argv[1:] or sorted(glob.glob(os.path.join(curdir, "..", "tests", "pdfs", "*.pdf")))
+    print("%-20s %12s %12s %8s %6s" % ("pdf", "full [s]", "metadata [s]", "speedup", "pages"))
+    for fn in fns:
+        try:
+            t_full, metadata_full = bench(read_summary, fn)
+            t_metadata, metadata = bench(pdfx.read_metadata, fn)
+        except pdfx.exceptions.PDFInvalidError:
+            continue
+        assert metadata == metadata_full
+        print(
+            "%-20s %12.3f %12.3f %7.1fx %6s"
+            % (
+                os.path.basename(fn)[:20],
+                t_full,
+                t_metadata,
+                t_full / t_metadata,
+                metadata.get("Pages"),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
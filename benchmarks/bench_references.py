@@ -0,0 +1,53 @@
+"""
+Microbenchmark of constructing (and classifying) 100k `Reference` objects,
+with time and memory.
+
+    $ python benchmarks/bench_references.py [n]
+
+The uris are a mix of urls, pdf urls, arxiv and doi links, with about 10%
+distinct uris (documents repeat their links, and corpora share them).
+"""
+from __future__ import absolute_import, division, print_function
+
+import sys
+import time
+import tracemalloc
+
+from pdfx.backends import Reference
+
+URIS = [
+    "https://example.com/page/%s",
+    "http://example.org/papers/%s.pdf",
+    "https://arxiv.org/abs/1501.%05d",
+    "http://dx.doi.org/DOI:10.1145/%s",
+    "www.example.net/%s?query=1",
+]
+
+
+def get_uris(n, distinct=0.1):
+    return [URIS[i % len(URIS)] % (i % max(1, int(n * distinct))) for i in range(n)]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    uris = get_uris(n)
+
+    best = None
+    for _ in range(3):
+        t = time.time()
+        refs = [Reference(uri, 1) for uri in uris]
+        elapsed = time.time() - t
+        best = elapsed if best is None else min(best, elapsed)
+        del refs
+
+    tracemalloc.start()
+    refs = [Reference(uri, 1) for uri in uris]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print("%s references: %.3f s, %.1f MB" % (n, best, size / 1024 / 1024))
+    print("Types: %s" % sorted(set(ref.reftype for ref in refs)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark of extracting a small PDF with a `pdfx -j` process per PDF against
+a request to the extraction server (`pdfx serve`).
+
+    $ python benchmarks/bench_server.py [pdf] [n]
+
+Without arguments, `tests/pdfs/i14doc2.pdf` is extracted 20 times.
+"""
+from __future__ import absolute_import, division, print_function
+
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+from urllib.request import urlopen
+
+from pdfx.server import ExtractionServer
+
+curdir = os.path.dirname(os.path.realpath(__file__))
+
+
+def bench(func, n):
+    t = time.time()
+    for _ in range(n):
+        func()
+    return (time.time() - t) / n
+
+
+def main():
+    fn_default = os.path.join(curdir, "..", "tests", "pdfs", "i14doc2.pdf")
+    fn = sys.argv[1] if len(sys.argv) > 1 else fn_default
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    server = ExtractionServer(("127.0.0.1", 0), workers=1)
+    url = "http://127.0.0.1:%s/extract" % server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    cmd = [sys.executable, "-m", "pdfx.cli", "-j", fn]
+    data = json.dumps({"path": os.path.abspath(fn)}).encode("utf-8")
+    t_process = bench(lambda: subprocess.run(cmd, stdout=subprocess.PIPE, check=True), n)
+    t_server = bench(lambda: urlopen(url, data).read(), n)
+    server.shutdown()
+    server.server_close()
+
+    print("pdfx -j process: %8.1f ms per PDF" % (t_process * 1000))
+    print("pdfx serve:      %8.1f ms per PDF" % (t_server * 1000))
+
+
+if __name__ == "__main__":
+    main()
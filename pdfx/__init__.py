@@ -23,8 +23,14 @@ PDFx can be used to extract infos from PDF in two ways:
 >>> metadata = pdf.get_metadata()
 >>> references_list = pdf.get_references()
 >>> references_dict = pdf.get_references_as_dict()
+>>> for page in pdf.iter_pages():
+...     print(page.page, page.get_references())
 >>> pdf.download_pdfs("target-directory")
 
+Only the metadata, without interpreting any page:
+
+>>> metadata = pdfx.read_metadata("filename-or-url.pdf")
+
 https://www.metachris.com/pdfx
 
 Copyright (c) 2015, Chris Hager <chris@linuxuser.at>
@@ -43,30 +49,55 @@ import sys
 import json
 import shutil
 import logging
+import importlib
 
-
-from .extractor import extract_urls
-from .backends import PDFMinerBackend, TextBackend
-from .downloader import download_urls
-from .exceptions import FileNotFoundError, DownloadError, PDFInvalidError
-from pdfminer.pdfparser import PDFSyntaxError
+from .sources import open_file, open_url, copy_file, spool_to_file, TIMEOUT_DEFAULT
+from .exceptions import FileNotFoundError, DownloadError, PDFInvalidError  # noqa: F401
 
 
 IS_PY2 = sys.version_info < (3, 0)
 
-if IS_PY2:
-    # Python 2
-    from cStringIO import StringIO as BytesIO
-    from urllib2 import Request, urlopen
-else:
+if not IS_PY2:
     # Python 3
-    from io import BytesIO
-    from urllib.request import Request, urlopen
-
     unicode = str
 
 logger = logging.getLogger(__name__)
 
+# pdfminer, the url regexes and the downloader are slow to import. They are
+# imported on first use, and these names (and submodules) of earlier versions
+# on first access (see `__getattr__`).
+LAZY_IMPORTS = {
+    "extract_urls": ".extractor",
+    "PDFMinerBackend": ".backends",
+    "TextBackend": ".backends",
+    "ResultBackend": ".backends",
+    "ResultCache": ".cache",
+    "HTTPCache": ".httpcache",
+    "download_urls": ".downloader",
+    "PDFSyntaxError": "pdfminer.pdfparser",
+}
+LAZY_SUBMODULES = (
+    "backends",
+    "cache",
+    "colorprint",
+    "downloader",
+    "extractor",
+    "httpcache",
+    "libs",
+    "threadpool",
+)
+
+
+def __getattr__(name):
+    """ Imports the names of `LAZY_IMPORTS` and `LAZY_SUBMODULES` on first access """
+    if name in LAZY_SUBMODULES:
+        return importlib.import_module("." + name, __name__)
+    if name in LAZY_IMPORTS:
+        value = getattr(importlib.import_module(LAZY_IMPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
 
 class PDFx(object):
     """
@@ -90,18 +121,67 @@ class PDFx(object):
     is_url = False  # False if file
     is_pdf = True
 
-    stream = None  # ByteIO Stream
+    stream = None  # Memory-mapped file or ByteIO Stream
+    spool = None  # Temporary file of a remote PDF, for parallel extraction
     reader = None  # ReaderBackend
-    summary = {}
-
-    def __init__(self, uri):
+    cache = None  # ResultCache
+    http_cache = None  # HTTPCache
+    stats = None  # Stats
+    _summary = None
+
+    def __init__(
+        self,
+        uri,
+        jobs=1,
+        layout="normal",
+        max_download_size=None,
+        download_timeout=TIMEOUT_DEFAULT,
+        cache=None,
+        http_cache=None,
+        timeout=None,
+        max_pages=None,
+        max_text_bytes=None,
+        max_memory=None,
+        stats=None,
+    ):
         """
-        Open PDF handle and parse PDF metadata
+        Open PDF handle and read the document structure. Metadata, text and
+        references are only parsed when first requested.
         - `uri` can bei either a filename or an url
+        - `jobs` is the number of processes used to interpret the pages
+        - `layout` "none" skips the layout analysis, which is much faster
+          if only the references are needed
+        - `max_download_size` (bytes) and `download_timeout` (seconds, or a
+          `(connect, read)` tuple) limit the download of remote PDFs
+        - `cache` is a `ResultCache` or a cache directory. Results of PDFs in
+          the cache are returned without parsing, other PDFs are parsed and
+          added to the cache. For an incremental update of a cached PDF, only
+          the changed pages are parsed.
+        - `http_cache` is an `HTTPCache` or a cache directory, to revalidate
+          remote PDFs (and referenced PDFs in `download_pdfs`) with
+          conditional requests instead of downloading them again
+        - `timeout` (seconds), `max_pages`, `max_text_bytes` and `max_memory`
+          (resident memory of the process, in bytes) are budgets of the
+          page interpretation. When one is exceeded, the pages parsed so far
+          are returned, and `summary["truncated"]` is the name of the budget.
+        - `stats` is a `stats.Stats` (or True for a new one) which records
+          the timings of the extraction stages, also in `summary["stats"]`
         """
+        from .extractor import extract_urls
+        from .backends import PDFMinerBackend, ResultBackend
+        from .cache import ResultCache
+        from .httpcache import HTTPCache
+        from .budget import Budget, DETERMINISTIC_BUDGETS
+        from .stats import Stats, timed
+
         logger.debug("Init with uri: %s" % uri)
 
         self.uri = uri
+        self.stats = Stats() if stats is True else stats
+
+        if http_cache is not None and not isinstance(http_cache, HTTPCache):
+            http_cache = HTTPCache(http_cache)
+        self.http_cache = http_cache
 
         # Find out whether pdf is an URL or local file
         url = extract_urls(uri)
@@ -111,21 +191,84 @@ class PDFx(object):
         if self.is_url:
             logger.debug("Reading url '%s'..." % uri)
             self.fn = uri.split("/")[-1]
-            try:
-                content = urlopen(Request(uri)).read()
-                self.stream = BytesIO(content)
-            except Exception as e:
-                raise DownloadError("Error downloading '%s' (%s)" % (uri, unicode(e)))
+            with timed(self.stats, "download"):
+                self.stream = open_url(
+                    uri,
+                    max_size=max_download_size,
+                    timeout=download_timeout,
+                    http_cache=http_cache,
+                )
+            # Worker processes for parallel extraction open the PDF by filename
+            source = None
+            if jobs > 1:
+                self.spool = spool_to_file(self.stream)
+                self.stream.close()
+                self.stream = open_file(self.spool.name)
+                source = self.spool.name
 
         else:
             if not os.path.isfile(uri):
                 raise FileNotFoundError("Invalid filename and not an url: '%s'" % uri)
             self.fn = os.path.basename(uri)
-            self.stream = open(uri, "rb")
+            self.stream = open_file(uri)
+            source = uri
+
+        self.jobs = jobs
+        self.layout = layout
+        self.source = source
+        self.max_pages = max_pages
+        self.budget = None
+        if timeout or max_text_bytes or max_memory:
+            self.budget = Budget(timeout, max_text_bytes, max_memory)
+
+        if cache is not None and not isinstance(cache, ResultCache):
+            cache = ResultCache(cache)
+        self.cache = cache
+
+        if self.cache is None:
+            self.reader = self.create_reader()
+        else:
+            # Results truncated by the other budgets are not cached
+            options = {"layout": layout}
+            if max_pages:
+                options["max_pages"] = max_pages
+            if max_text_bytes:
+                options["max_text_bytes"] = max_text_bytes
+            with timed(self.stats, "cache"):
+                cache_key = self.cache.get_key(self.stream, options)
+                result = self.cache.get(cache_key)
+            if result is not None:
+                self.reader = ResultBackend(result)
+            else:
+                self.reader = self.create_reader()
+
+                # Only parse the pages changed since an earlier revision
+                with timed(self.stats, "cache"):
+                    previous = self.cache.get_previous_revision(self.stream, options)
+                if previous is not None and isinstance(self.reader, PDFMinerBackend):
+                    self.reader.set_previous_result(previous)
+                result = self.reader.get_result()
+                if result["truncated"] in (None,) + DETERMINISTIC_BUDGETS:
+                    self.cache.put(cache_key, result)
+
+    def create_reader(self):
+        """
+        Create ReaderBackend instance (only reads the document structure,
+        metadata and content are parsed on first use)
+        """
+        from .backends import PDFMinerBackend, TextBackend
+        from pdfminer.pdfparser import PDFSyntaxError
 
-        # Create ReaderBackend instance
         try:
-            self.reader = PDFMinerBackend(self.stream)
+            return PDFMinerBackend(
+                self.stream,
+                maxpages=self.max_pages or 0,
+                jobs=self.jobs,
+                source=self.source,
+                layout=self.layout,
+                budget=self.budget,
+                stats=self.stats,
+            )
         except PDFSyntaxError as e:
             raise PDFInvalidError("Invalid PDF (%s)" % unicode(e))
 
@@ -133,32 +276,58 @@ class PDFx(object):
             logger.info(unicode(e))
             logger.info("Trying to create a TextReader backend...")
             self.stream.seek(0)
-            self.reader = TextBackend(self.stream)
             self.is_pdf = False
+            return TextBackend(self.stream)
         except Exception as e:
             raise
             raise PDFInvalidError("Invalid PDF (%s)" % unicode(e))
 
-        # Save metadata to user-supplied directory
-        self.summary = {
-            "source": {
-                "type": "url" if self.is_url else "file",
-                "location": self.uri,
-                "filename": self.fn,
-            },
-            "metadata": self.reader.get_metadata(),
+    @property
+    def summary(self):
+        """ Source infos, metadata and references (computed on first access) """
+        if self._summary is None:
+            self._summary = {
+                "source": self.get_source(),
+                "metadata": self.reader.get_metadata(),
+                "references": self.reader.get_references_as_dict(),
+            }
+            if self.reader.truncated:
+                self._summary["truncated"] = self.reader.truncated
+            if self.stats is not None:
+                self._summary["stats"] = self.stats.as_dict()
+        return self._summary
+
+    @property
+    def metadata_summary(self):
+        """ Source infos and metadata, without parsing the pages """
+        return {"source": self.get_source(), "metadata": self.reader.get_metadata()}
+
+    def get_source(self):
+        return {
+            "type": "url" if self.is_url else "file",
+            "location": self.uri,
+            "filename": self.fn,
         }
 
-        # Search for URLs
-        self.summary["references"] = self.reader.get_references_as_dict()
-        # print(self.summary)
-
     def get_text(self):
         return self.reader.get_text()
 
     def get_metadata(self):
         return self.reader.get_metadata()
 
+    def iter_pages(self):
+        """
+        Yields a `Page` (page number, text, annotation and text references)
+        for each page as soon as it is parsed, without keeping the whole
+        document in memory.
+        """
+        from .backends import PDFMinerBackend
+
+        if not isinstance(self.reader, PDFMinerBackend):
+            # Cached results have no per-page data, parse the PDF again
+            return self.create_reader().iter_pages()
+        return self.reader.iter_pages()
+
     def get_references(self, reftype=None, sort=False):
         """ reftype can be `None` for all, `pdf`, etc. """
         return self.reader.get_references(reftype=reftype, sort=sort)
@@ -172,7 +341,14 @@ class PDFx(object):
         r = self.reader.get_references(reftype=reftype)
         return len(r)
 
-    def download_pdfs(self, target_dir):
+    def download_pdfs(self, target_dir, **download_options):
+        """
+        Save the original PDF, its infos and all referenced PDFs into
+        `target_dir`. `download_options` are passed on to
+        `downloader.download_urls` (eg. `max_connections` or `rate_limit`).
+        """
+        from .downloader import download_urls
+
         logger.debug("Download pdfs to %s" % target_dir)
         assert target_dir, "Need a download directory"
         assert not os.path.isfile(target_dir), "Download directory is a file"
@@ -184,9 +360,12 @@ class PDFx(object):
 
         # Save original PDF to user-supplied directory
         fn = os.path.join(target_dir, self.fn)
-        with open(fn, "wb") as f:
-            self.stream.seek(0)
-            shutil.copyfileobj(self.stream, f)
+        if self.is_url:
+            with open(fn, "wb") as f:
+                self.stream.seek(0)
+                shutil.copyfileobj(self.stream, f)
+        else:
+            copy_file(self.uri, fn)
         logger.debug("- Saved original pdf as '%s'" % fn)
 
         fn_json = "%s.infos.json" % fn
@@ -203,4 +382,23 @@ class PDFx(object):
         logger.debug("Downloading %s referenced pdfs..." % len(urls))
 
         # Download urls as a set to avoid duplicates
-        download_urls(urls, dir_referenced_pdfs)
+        download_urls(
+            urls, dir_referenced_pdfs, http_cache=self.http_cache, **download_options
+        )
+
+
+def read_metadata(uri, **options):
+    """
+    Returns the metadata of a PDF: the info dict, XMP metadata and the page
+    count from the page tree root. No page is interpreted. `options` are
+    passed on to `PDFx` (eg. `max_download_size`), except `cache`, which
+    would parse all pages for the cached result.
+    """
+    options.pop("cache", None)
+    return PDFx(uri, **options).get_metadata()
+
+
+if sys.version_info < (3, 7):
+    # No module __getattr__ (PEP 562): import everything now
+    for _name in list(LAZY_IMPORTS) + list(LAZY_SUBMODULES):
+        __getattr__(_name)
@@ -0,0 +1,508 @@
+# -*- coding: utf-8 -*-
+"""
+Asynchronous link checker and downloader (Python 3 only, no dependencies).
+
+Based on a small HTTP/1.1 client on top of asyncio streams, which keeps
+connections alive and reuses them per host, and limits the number of
+concurrent requests (in total and per host) and optionally the request
+rate. Thousands of urls can be checked concurrently.
+
+>>> from pdfx.aiodownloader import AsyncHTTPClient, run
+>>> async def main():
+...     async with AsyncHTTPClient(max_per_host=4) as client:
+...         response = await client.request("HEAD", "https://arxiv.org")
+...         print(response.status)
+>>> run(main())
+"""
+import os
+import shutil
+import asyncio
+import logging
+import tempfile
+import time
+from collections import defaultdict
+from email.utils import parsedate_tz, mktime_tz
+from http.client import HTTPMessage
+from urllib.parse import urlsplit, urljoin, quote
+
+from .colorprint import colorprint, OKGREEN, FAIL
+from .downloader import (
+    sanitize_url,
+    interleave_by_host,
+    format_size,
+    get_ssl_unverified_context,
+    USER_AGENT,
+    CHUNK_SIZE,
+    TIMEOUT_DEFAULT,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_CONNECTIONS_DEFAULT = 100
+MAX_PER_HOST_DEFAULT = 6
+
+MAX_REDIRECTS = 10
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+# Throttled requests (429, 503 with Retry-After) are retried after the
+# Retry-After delay, or after RETRY_BACKOFF * 2^n seconds
+MAX_RETRIES_DEFAULT = 3
+RETRY_BACKOFF = 1
+MAX_RETRY_DELAY = 120
+
+
+class HTTPClientError(Exception):
+    """ Raised if a response cannot be parsed """
+
+
+def run(coro):
+    """ Runs a coroutine in a new event loop (like `asyncio.run` in Python 3.7+) """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class Response(object):
+    """ Status and headers of a response. The body is written to a file, if any """
+
+    def __init__(self, url, status, reason, headers):
+        self.url = url  # Final url, after redirects
+        self.status = status
+        self.reason = reason
+        self.headers = headers  # HTTPMessage (case-insensitive)
+
+
+class IdleTimeoutReader(object):
+    """
+    `StreamReader` whose reads fail with `asyncio.TimeoutError` if no data
+    arrives for `timeout` seconds (a slow but progressing body is fine)
+    """
+
+    def __init__(self, reader, timeout):
+        self.reader = reader
+        self.timeout = timeout
+
+    async def readline(self):
+        return await asyncio.wait_for(self.reader.readline(), self.timeout)
+
+    async def read(self, n=-1):
+        return await asyncio.wait_for(self.reader.read(n), self.timeout)
+
+
+class RateLimiter(object):
+    """ Spaces out the start of requests to at most `rate` per second """
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_time = 0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = asyncio.get_event_loop().time()
+        delay = self.next_time - now
+        self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class ConnectionPool(object):
+    """ Idle keep-alive connections per `(scheme, host, port)` """
+
+    def __init__(self, ssl_context=None, max_idle_per_host=MAX_PER_HOST_DEFAULT):
+        self.ssl_context = ssl_context
+        self.max_idle_per_host = max_idle_per_host
+        self.idle = defaultdict(list)
+
+    async def acquire(self, key):
+        """ Returns `(reader, writer, reused)`, reusing an idle connection if possible """
+        while self.idle[key]:
+            reader, writer = self.idle[key].pop()
+            if not reader.at_eof() and not writer.transport.is_closing():
+                return reader, writer, True
+            writer.close()
+
+        scheme, host, port = key
+        if scheme == "https":
+            reader, writer = await asyncio.open_connection(
+                host, port, ssl=self.ssl_context, server_hostname=host
+            )
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return reader, writer, False
+
+    def release(self, key, reader, writer):
+        if len(self.idle[key]) < self.max_idle_per_host:
+            self.idle[key].append((reader, writer))
+        else:
+            writer.close()
+
+    def close(self):
+        for connections in self.idle.values():
+            for _, writer in connections:
+                writer.close()
+        self.idle.clear()
+
+
+class HostState(object):
+    """ Concurrency limit and backoff (after 429 / Retry-After) of a single host """
+
+    def __init__(self, max_concurrent):
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.blocked_until = 0
+
+    def backoff(self, delay):
+        """ Send no further requests to this host for `delay` seconds """
+        until = asyncio.get_event_loop().time() + delay
+        self.blocked_until = max(self.blocked_until, until)
+
+    async def wait(self):
+        """ Waits until the backoff of this host is over """
+        while True:
+            delay = self.blocked_until - asyncio.get_event_loop().time()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+
+def get_host_key(url):
+    """ Returns `(scheme, host, port)` of an url """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https") or not parts.hostname:
+        raise HTTPClientError("Unsupported url '%s'" % url)
+    return scheme, parts.hostname, parts.port or (443 if scheme == "https" else 80)
+
+
+def parse_retry_after(value):
+    """ Returns the seconds of a Retry-After header (delay or HTTP date), or None """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        return max(0, mktime_tz(parsedate_tz(value)) - time.time())
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+class AsyncHTTPClient(object):
+    """
+    HTTP/1.1 client with connection pooling and a per-host scheduler:
+    - `max_connections`: concurrent requests in total
+    - `max_per_host`: concurrent requests (and idle connections) per host
+    - `rate_limit`: maximum requests per second in total (default: unlimited)
+    - `timeout`: seconds to connect, and seconds without receiving data
+      (an idle timeout, large downloads may take longer in total)
+    - `max_retries`: retries of responses with status 429, and 503 with
+      Retry-After. The host is paused for the Retry-After delay (or an
+      exponential backoff), while requests to other hosts continue.
+    - `ssl_context`: for https urls (default: certificates are not verified)
+    """
+
+    def __init__(
+        self,
+        max_connections=MAX_CONNECTIONS_DEFAULT,
+        max_per_host=MAX_PER_HOST_DEFAULT,
+        rate_limit=None,
+        timeout=TIMEOUT_DEFAULT,
+        max_retries=MAX_RETRIES_DEFAULT,
+        ssl_context=None,
+    ):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.semaphore = asyncio.Semaphore(max_connections)
+        self.hosts = {}
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.pool = ConnectionPool(ssl_context or get_ssl_unverified_context(), max_per_host)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.pool.close()
+
+    def get_host(self, key):
+        if key not in self.hosts:
+            self.hosts[key] = HostState(self.max_per_host)
+        return self.hosts[key]
+
+    async def request(self, method, url, headers=None, out=None):
+        """
+        Sends a request, follows redirects and retries throttled requests.
+        The body of the final response is written to the file `out` (or
+        discarded). Returns the `Response`.
+        """
+        redirects = 0
+        retries = 0
+        while True:
+            response = await self.request_once(method, url, headers, out)
+
+            location = response.headers.get("Location")
+            if response.status in REDIRECT_CODES and location:
+                redirects += 1
+                if redirects > MAX_REDIRECTS:
+                    raise HTTPClientError("Too many redirects")
+                url = urljoin(url, location)
+                continue
+
+            delay = self.get_retry_delay(response, retries)
+            if delay is None:
+                return response
+
+            logger.debug("%s for '%s', retrying in %ss" % (response.status, url, delay))
+            retries += 1
+            self.get_host(get_host_key(url)).backoff(delay)
+            if out is not None:
+                out.seek(0)
+                out.truncate()
+
+    def get_retry_delay(self, response, retries):
+        """ Returns the seconds to wait before retrying a response, or None """
+        if retries >= self.max_retries or response.status not in (429, 503):
+            return None
+        delay = parse_retry_after(response.headers.get("Retry-After"))
+        if delay is None:
+            if response.status == 503:
+                # Without Retry-After probably not a temporary throttle
+                return None
+            delay = RETRY_BACKOFF * 2 ** retries
+        return delay if delay <= MAX_RETRY_DELAY else None
+
+    async def request_once(self, method, url, headers=None, out=None):
+        """
+        Sends a single request, within the limits of its host (first, so that
+        throttled hosts don't occupy connection slots), the global connection
+        limit and the rate limit
+        """
+        key = get_host_key(url)
+        host = self.get_host(key)
+        async with host.semaphore:
+            await host.wait()
+            async with self.semaphore:
+                await self.rate_limiter.wait()
+                return await self.send(key, method, url, headers, out)
+
+    async def send(self, key, method, url, headers, out):
+        parts = urlsplit(url)
+        path = quote(parts.path or "/", safe="/%:@&=+$,;~!*'()")
+        if parts.query:
+            path += "?" + parts.query
+
+        scheme, host, port = key
+        if port != (443 if scheme == "https" else 80):
+            host = "%s:%s" % (host, port)
+        lines = [
+            "%s %s HTTP/1.1" % (method, path),
+            "Host: %s" % host,
+            "User-Agent: %s" % USER_AGENT,
+            "Accept-Encoding: identity",
+            "Connection: keep-alive",
+        ]
+        for header, value in (headers or {}).items():
+            lines.append("%s: %s" % (header, value))
+        data = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+        for attempt in range(2):
+            reader, writer, reused = await asyncio.wait_for(self.pool.acquire(key), self.timeout)
+            status_line = None
+            try:
+                writer.write(data)
+                await asyncio.wait_for(writer.drain(), self.timeout)
+                status_line = await IdleTimeoutReader(reader, self.timeout).readline()
+                if not status_line:
+                    raise ConnectionResetError("Connection closed by server")
+                response, keep_alive = await self.read_response(
+                    IdleTimeoutReader(reader, self.timeout), status_line, url, method, out
+                )
+            except OSError:
+                writer.close()
+                if reused and not status_line and attempt == 0:
+                    # The server closed the idle keep-alive connection, retry
+                    continue
+                raise
+            except BaseException:
+                # Includes cancellation by the timeout
+                writer.close()
+                raise
+
+            if keep_alive:
+                self.pool.release(key, reader, writer)
+            else:
+                writer.close()
+            return response
+
+    async def read_response(self, reader, status_line, url, method, out):
+        """ Returns the response and whether the connection can be reused """
+        try:
+            version, status, reason = (status_line.decode("latin-1").split(None, 2) + [""])[:3]
+            status = int(status)
+        except ValueError:
+            raise HTTPClientError("Invalid status line %r" % status_line)
+
+        headers = HTTPMessage()
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip()] = value.strip()
+
+        connection = (headers.get("Connection") or "").lower()
+        if version == "HTTP/1.0":
+            keep_alive = connection == "keep-alive"
+        else:
+            keep_alive = connection != "close"
+
+        response = Response(url, status, reason.strip(), headers)
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            return response, keep_alive
+
+        # Bodies of redirects are only read to reuse the connection
+        if status in REDIRECT_CODES:
+            out = None
+
+        if "chunked" in (headers.get("Transfer-Encoding") or "").lower():
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip(), 16)
+                if size == 0:
+                    # Skip trailers
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return response, keep_alive
+                await copy_body(reader, size, out)
+                await reader.readline()
+
+        length = headers.get("Content-Length")
+        if length is not None:
+            await copy_body(reader, int(length), out)
+            return response, keep_alive
+
+        # Body until the connection is closed
+        await copy_body(reader, None, out)
+        return response, False
+
+    async def get_status(self, url):
+        """ Performs a HEAD request and returns the status code, or the error as string """
+        return (await self.check_url(url))[0]
+
+    async def check_url(self, url):
+        """
+        Performs a HEAD request and returns the status code (or the error as
+        string) and the final url after redirects (or None)
+        """
+        try:
+            response = await self.request("HEAD", sanitize_url(url))
+            return response.status, response.url
+        except asyncio.TimeoutError:
+            return "timed out", None
+        except Exception as e:
+            return str(e) or type(e).__name__, None
+
+
+async def copy_body(reader, size, out):
+    """ Copies `size` bytes (or everything until EOF if None) from reader to out """
+    while size is None or size > 0:
+        chunk = await reader.read(CHUNK_SIZE if size is None else min(size, CHUNK_SIZE))
+        if not chunk:
+            if size is None:
+                return
+            raise asyncio.IncompleteReadError(b"", size)
+        if size is not None:
+            size -= len(chunk)
+        if out is not None:
+            out.write(chunk)
+
+
+async def check_refs_async(refs, callback=None, **client_options):
+    """
+    Checks the urls of all refs concurrently. Returns a dict of
+    `status -> [ref, ...]`, where status is the HTTP status code or the
+    error (as string). `callback(ref, status, final_url)` is called for each
+    finished check. `client_options` are passed on to `AsyncHTTPClient`.
+    """
+    codes = defaultdict(list)
+
+    async with AsyncHTTPClient(**client_options) as client:
+
+        async def check(ref):
+            status, final_url = await client.check_url(ref.ref)
+            status = str(status)
+            codes[status].append(ref)
+            if callback:
+                callback(ref, status, final_url)
+
+        await asyncio.gather(*[check(ref) for ref in interleave_by_host(refs, lambda ref: ref.ref)])
+    return codes
+
+
+async def download_url_async(client, url, output_directory, http_cache=None):
+    """
+    Async version of `downloader.download_url`: streams the body into a
+    temporary file, which is renamed to the target filename once complete.
+    Returns the filename, or None if the download failed.
+    """
+    fn = url.split("/")[-1].split("?")[0]
+    fn_download = os.path.join(output_directory, fn)
+    fd, fn_tmp = tempfile.mkstemp(prefix=".%s." % fn, suffix=".part", dir=output_directory)
+    headers = http_cache.get_conditional_headers(url) if http_cache is not None else {}
+    try:
+        time_start = time.time()
+        with os.fdopen(fd, "wb") as f:
+            response = await client.request("GET", sanitize_url(url), headers, out=f)
+            size = f.tell()
+        elapsed = max(time.time() - time_start, 1e-6)
+
+        if response.status == 304 and http_cache is not None:
+            shutil.copyfile(http_cache.get_filename(url), fn_tmp)
+            os.replace(fn_tmp, fn_download)
+            colorprint(OKGREEN, "Not modified '%s', copied to '%s'" % (url, fn_download))
+            return fn_download
+
+        if response.status != 200:
+            colorprint(FAIL, "Error downloading '%s' (%s)" % (url, response.status))
+            return None
+
+        if http_cache is not None and http_cache.is_cacheable(response.headers):
+            fn_cache = http_cache.get_tempfile(url)
+            shutil.copyfile(fn_tmp, fn_cache)
+            http_cache.put(url, response.headers, fn_cache)
+
+        os.replace(fn_tmp, fn_download)
+        colorprint(
+            OKGREEN,
+            "Downloaded '%s' to '%s' (%s, %s/s)"
+            % (url, fn_download, format_size(size), format_size(size / elapsed)),
+        )
+        return fn_download
+
+    except asyncio.TimeoutError:
+        colorprint(FAIL, "Error downloading '%s' (timed out)" % url)
+    except Exception as e:
+        colorprint(FAIL, "Error downloading '%s' (%s)" % (url, str(e)))
+    finally:
+        if os.path.exists(fn_tmp):
+            os.remove(fn_tmp)
+    return None
+
+
+async def download_urls_async(urls, output_directory, http_cache=None, **client_options):
+    """
+    Downloads all urls concurrently into `output_directory`. Returns the
+    list of filenames (None for failed downloads). `client_options` are
+    passed on to `AsyncHTTPClient`.
+    """
+    async with AsyncHTTPClient(**client_options) as client:
+        return await asyncio.gather(
+            *[
+                download_url_async(client, url, output_directory, http_cache)
+                for url in interleave_by_host(urls)
+            ]
+        )
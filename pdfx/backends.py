@@ -6,15 +6,17 @@ PDF Backend: pdfMiner
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import sys
+import hashlib
 import logging
+import multiprocessing
 from io import BytesIO
 from re import compile
 
-# Character Detection Helper
-import chardet
-
 # Find URLs in text via regex
 from . import extractor
+from .budget import Budget
+from .exceptions import BudgetExceededError
+from .stats import clock, timed
 from .libs.xmp import xmp_to_dict
 
 # Setting `psparser.STRICT` is the first thing to do because it is
@@ -26,10 +28,13 @@ from pdfminer import psparser  # noqa: E402
 from pdfminer.pdfdocument import PDFDocument  # noqa: E402
 from pdfminer.pdfparser import PDFParser  # noqa: E402
 from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter  # noqa: E402
-from pdfminer.pdfpage import PDFPage  # noqa: E402
-from pdfminer.pdftypes import resolve1, PDFObjRef  # noqa: E402
+from pdfminer.pdfpage import PDFPage, LITERAL_PAGE  # noqa: E402
+from pdfminer.pdftypes import resolve1, PDFObjRef, PDFStream  # noqa: E402
 from pdfminer.converter import TextConverter  # noqa: E402
 from pdfminer.layout import LAParams  # noqa: E402
+from pdfminer.pdfdevice import PDFTextDevice  # noqa: E402
+from pdfminer.pdffont import PDFUnicodeNotDefined  # noqa: E402
+from pdfminer.utils import PDFDocEncoding  # noqa: E402
 
 
 logger = logging.getLogger(__name__)
@@ -50,59 +55,106 @@ def make_compat_str(in_str):
     if not in_str:
         return unicode()
 
-    # Chardet in Py2 works on str + bytes objects
+    # In Py2 metadata can be str (bytes) or unicode objects
     if IS_PY2 and isinstance(in_str, unicode):
         return in_str
 
-    # Chardet in Py3 works on bytes objects
+    # In Py3 only bytes objects need to be decoded
     if not IS_PY2 and not isinstance(in_str, bytes):
         return in_str
 
-    # Detect the encoding now
-    enc = chardet.detect(in_str)
+    return decode_bytes(in_str)
 
-    # Decode the object into a unicode object
-    out_str = in_str.decode(enc["encoding"])
 
-    # Cleanup
-    if enc["encoding"] == "UTF-16BE":
-        # Remove byte order marks (BOM)
-        if out_str.startswith("\ufeff"):
-            out_str = out_str[1:]
-    return out_str
+def decode_bytes(in_bytes):
+    """
+    Decodes a PDF text string. Byte order marks and valid UTF-8 are
+    unambiguous; only other 8-bit strings need the (slow) encoding
+    detection of chardet, with PDFDocEncoding as fallback.
+    """
+    if in_bytes.startswith(b"\xfe\xff"):
+        return in_bytes[2:].decode("utf-16-be", "replace")
+    if in_bytes.startswith(b"\xff\xfe"):
+        return in_bytes[2:].decode("utf-16-le", "replace")
+    if in_bytes.startswith(b"\xef\xbb\xbf"):
+        return in_bytes[3:].decode("utf-8", "replace")
 
+    try:
+        return in_bytes.decode("utf-8")
+    except UnicodeDecodeError:
+        pass
 
-class Reference(object):
-    """ Generic Reference """
+    encoding = detect_encoding(in_bytes)
+    if encoding:
+        try:
+            return in_bytes.decode(encoding)
+        except (LookupError, UnicodeDecodeError):
+            pass
+    return "".join(PDFDocEncoding[c] for c in bytearray(in_bytes))
 
-    ref = ""
-    reftype = "url"
-    page = 0
 
-    def __init__(self, uri, page=0):
-        self.ref = uri
-        self.reftype = "url"
-        self.page = page
+def detect_encoding(in_bytes):
+    """ Returns the encoding guessed by chardet, or None """
+    # chardet is slow to import and only needed for a few strings
+    import chardet
 
-        self.pdf_regex = compile(r"\.pdf(:?\?.*)?$")
+    return chardet.detect(in_bytes)["encoding"]
 
-        # Detect reftype by filetype
-        if self.pdf_regex.search(uri.lower()):
-            self.reftype = "pdf"
-            return
 
-        # Detect reftype by extractor
-        arxiv = extractor.extract_arxiv(uri)
-        if arxiv:
-            self.ref = arxiv.pop()
-            self.reftype = "arxiv"
-            return
+# Urls ending with .pdf (optionally with a query)
+PDF_PATTERN = compile(r"\.pdf(:?\?.*)?$")
 
-        doi = extractor.extract_doi(uri)
-        if doi:
-            self.ref = doi.pop()
-            self.reftype = "doi"
-            return
+# Maximum number of uris in the cache of `classify`
+CLASSIFY_CACHE_SIZE = 10000
+classify_cache = {}
+
+
+def classify(uri):
+    """
+    Returns `(ref, reftype)` of an uri: pdf urls, arxiv and doi ids (also
+    from links like https://arxiv.org/abs/...), else url. Memoized, because
+    documents (and corpora) repeat their links.
+    """
+    try:
+        return classify_cache[uri]
+    except KeyError:
+        pass
+
+    if PDF_PATTERN.search(uri.lower()):
+        ret = (uri, "pdf")
+    else:
+        match = extractor.find_id(uri)
+        if match and match.reftype != "url":
+            ret = (match.ref, match.reftype)
+        else:
+            ret = (uri, "url")
+
+    if len(classify_cache) >= CLASSIFY_CACHE_SIZE:
+        classify_cache.clear()
+    classify_cache[uri] = ret
+    return ret
+
+
+class Reference(object):
+    """
+    Generic Reference, with its location in the document:
+    - `page`: page number (starting at 1, 0 if unknown)
+    - `offset`: character offset in the text of the page (text references)
+    - `bbox`: `(x0, y0, x1, y1)` of the annotation's `Rect` (annotation references)
+    """
+
+    __slots__ = ("ref", "reftype", "page", "offset", "bbox")
+
+    def __init__(self, uri, page=0, reftype=None, offset=None, bbox=None):
+        if reftype:
+            # Already classified (eg. restored from the cache)
+            self.ref = uri
+            self.reftype = reftype
+        else:
+            self.ref, self.reftype = classify(uri)
+        self.page = page
+        self.offset = offset
+        self.bbox = tuple(bbox) if bbox else None
 
     def __hash__(self):
         return hash(self.ref)
@@ -111,9 +163,155 @@ class Reference(object):
         assert isinstance(other, Reference)
         return self.ref == other.ref
 
+    def __ne__(self, other):
+        return not self == other
+
+    def __lt__(self, other):
+        return (self.reftype, self.ref) < (other.reftype, other.ref)
+
     def __str__(self):
         return "<%s: %s>" % (self.reftype, self.ref)
 
+    def __repr__(self):
+        return "Reference(%r, %r, %r, %r, %r)" % (
+            self.ref,
+            self.page,
+            self.reftype,
+            self.offset,
+            self.bbox,
+        )
+
+
+def extract_references(text, page=0, stats=None):
+    """
+    Returns the set of url, arxiv and doi references found in a text (with
+    their first offset in the text)
+    """
+    matches = extractor.extract_references(text)
+    if stats is not None:
+        with stats.timer("references.regex"):
+            matches = list(matches)
+
+    refs = set()
+    with timed(stats, "references.classify"):
+        for match in matches:
+            # Urls can still be pdfs, or arxiv and doi links
+            reftype = None if match.reftype == "url" else match.reftype
+            refs.add(Reference(match.ref, page, reftype, match.start))
+    return refs
+
+
+def references_as_lists(refs):
+    """ Returns the refs as JSON-serializable `[ref, reftype, page, offset, bbox]` lists """
+    return [[r.ref, r.reftype, r.page, r.offset, r.bbox] for r in refs]
+
+
+def references_from_lists(items):
+    """ Returns the references of `references_as_lists` (or 3-item lists of earlier versions) """
+    return [Reference(item[0], item[2], item[1], *item[3:]) for item in items]
+
+
+def references_as_dict(refs):
+    """ Returns the refs as dict of `reftype -> [ref, ...]` """
+    ret = {}
+    for r in refs:
+        if r.reftype in ret:
+            ret[r.reftype].append(r.ref)
+        else:
+            ret[r.reftype] = [r.ref]
+    return ret
+
+
+class Page(object):
+    """ Text and references of a single page (as yielded by `iter_pages`) """
+
+    def __init__(self, page, text, annotation_references, text_references):
+        self.page = page  # Page number, starting at 1
+        self.text = text
+        self.annotation_references = annotation_references
+        self.text_references = text_references
+
+    def get_references(self):
+        return set(self.annotation_references) | self.text_references
+
+    def as_dict(self):
+        return {
+            "page": self.page,
+            "text": self.text,
+            "annotation_references": references_as_dict(self.annotation_references),
+            "text_references": references_as_dict(self.text_references),
+        }
+
+    def __str__(self):
+        return "<Page %s>" % self.page
+
+
+class RawTextConverter(PDFTextDevice):
+    """
+    Writes the text runs of the content streams in the order they are shown,
+    without pdfminer's layout analysis (character grouping into lines and
+    boxes). Runs are separated by a newline if they start on a new line, and
+    by a space if they are moved apart on the same line or by a large TJ
+    offset. Much faster than `TextConverter`, but the reading order is that
+    of the content stream.
+    """
+
+    # TJ offsets (in thousandths of text space) larger than this are spaces
+    WORD_SPACE_OFFSET = 200
+
+    def __init__(self, rsrcmgr, outfp, codec="utf-8"):
+        PDFTextDevice.__init__(self, rsrcmgr)
+        self.outfp = outfp
+        self.codec = codec
+        self.last_matrix = None
+
+    def write(self, text):
+        self.outfp.write(text.encode(self.codec, "ignore"))
+
+    def begin_page(self, page, ctm):
+        self.last_matrix = None
+
+    def end_page(self, page):
+        self.write("\n\f")
+
+    def render_string(self, textstate, seq, ncs, graphicstate):
+        # Td, TD, T* and Tm set a new text matrix, Tj and TJ don't
+        matrix = textstate.matrix
+        if self.last_matrix is not None and matrix != self.last_matrix:
+            self.write("\n" if matrix[5] != self.last_matrix[5] else " ")
+        self.last_matrix = matrix
+
+        font = textstate.font
+        chars = []
+        for obj in seq:
+            if isinstance(obj, bytes):
+                for cid in font.decode(obj):
+                    try:
+                        chars.append(font.to_unichr(cid))
+                    except PDFUnicodeNotDefined:
+                        pass
+            elif obj < -self.WORD_SPACE_OFFSET:
+                chars.append(" ")
+        self.write("".join(chars))
+
+
+class BudgetInterpreter(PDFPageInterpreter):
+    """
+    Interpreter which checks a `Budget` on every operator with arguments,
+    also in nested XObjects, to stop in the middle of a pathological page
+    """
+
+    def __init__(self, rsrcmgr, device, budget):
+        PDFPageInterpreter.__init__(self, rsrcmgr, device)
+        self.budget = budget
+
+    def dup(self):
+        return self.__class__(self.rsrcmgr, self.device, self.budget)
+
+    def pop(self, n):
+        self.budget.tick()
+        return PDFPageInterpreter.pop(self, n)
+
 
 class ReaderBackend(object):
     """
@@ -125,11 +323,13 @@ class ReaderBackend(object):
     text = ""
     metadata = {}
     references = set()
+    truncated = None  # Name of the budget which stopped the extraction
 
     def __init__(self):
         self.text = ""
         self.metadata = {}
         self.references = set()
+        self.truncated = None
 
     def get_metadata(self):
         return self.metadata
@@ -163,6 +363,15 @@ class ReaderBackend(object):
     def get_text(self):
         return self.text
 
+    def get_result(self):
+        """ Returns metadata, text and references as JSON-serializable dict """
+        return {
+            "metadata": self.get_metadata(),
+            "text": self.get_text(),
+            "references": references_as_lists(self.get_references()),
+            "truncated": self.truncated,
+        }
+
     def get_references(self, reftype=None, sort=False):
         refs = self.references
         if reftype:
@@ -170,107 +379,454 @@ class ReaderBackend(object):
         return sorted(refs) if sort else refs
 
     def get_references_as_dict(self, reftype=None, sort=False):
-        ret = {}
         refs = self.references
         if reftype:
             refs = set([ref for ref in refs if ref.reftype == "pdf"])
-        for r in sorted(refs) if sort else refs:
-            if r.reftype in ret:
-                ret[r.reftype].append(r.ref)
-            else:
-                ret[r.reftype] = [r.ref]
-        return ret
+        return references_as_dict(sorted(refs) if sort else refs)
 
 
 class PDFMinerBackend(ReaderBackend):
-    def __init__(self, pdf_stream, password="", pagenos=[], maxpages=0):  # noqa: C901
+    """
+    Reader for PDF files, based on pdfminer.
+
+    Only the document structure (trailer, xref and catalog) is parsed on
+    init. Metadata is read from the info dict, XMP stream and page tree root
+    when first requested, and the pages are only interpreted once text or
+    references are requested.
+
+    With a `budget.Budget`, the pages are only interpreted until it is
+    exceeded, and `truncated` is set to the name of the exceeded budget
+    (also `max_pages` if there are more pages than `maxpages`). With `jobs`,
+    `max_memory` applies to each worker process. With a
+    `stats.Stats`, the timings of the stages are recorded.
+    """
+
+    LAYOUTS = ("normal", "none")
+
+    def __init__(
+        self,
+        pdf_stream,
+        password="",
+        pagenos=[],
+        maxpages=0,
+        jobs=1,
+        source=None,
+        layout="normal",
+        budget=None,
+        stats=None,
+    ):
+        assert layout in self.LAYOUTS, "Unknown layout '%s'" % layout
         ReaderBackend.__init__(self)
         self.pdf_stream = pdf_stream
+        self.password = password
+        self.pagenos = pagenos
+        self.maxpages = maxpages
+        self.jobs = jobs
+        self.source = source
+        self.layout = layout
+        self.budget = budget
+        self.stats = stats
+        self.curpage = 0
+
+        # Page number, text length and annotation references of each parsed
+        # page, and the pages of an earlier revision to reuse (by fingerprint)
+        self.pages = []
+        self.previous_pages = {}
+
+        self.metadata_parsed = False
+        self.content_parsed = False
+
+        with timed(stats, "parse"):
+            parser = PDFParser(pdf_stream)
+            self.doc = PDFDocument(parser, password=password, caching=True)
+
+    def get_metadata(self):
+        if not self.metadata_parsed:
+            self.parse_metadata()
+        return self.metadata
 
-        # Extract Metadata
-        parser = PDFParser(pdf_stream)
-        doc = PDFDocument(parser, password=password, caching=True)
-        if doc.info:
-            for k in doc.info[0]:
-                v = doc.info[0][k]
-                # print(repr(v), type(v))
-                if isinstance(v, (bytes, str, unicode)):
-                    self.metadata[k] = make_compat_str(v)
-                elif isinstance(v, (psparser.PSLiteral, psparser.PSKeyword)):
-                    self.metadata[k] = make_compat_str(v.name)
+    def get_text(self):
+        if not self.content_parsed:
+            self.parse_content()
+        return self.text
+
+    def get_references(self, reftype=None, sort=False):
+        if not self.content_parsed:
+            self.parse_content()
+        return ReaderBackend.get_references(self, reftype=reftype, sort=sort)
+
+    def get_references_as_dict(self, reftype=None, sort=False):
+        if not self.content_parsed:
+            self.parse_content()
+        return ReaderBackend.get_references_as_dict(self, reftype=reftype, sort=sort)
+
+    def get_page_count(self):
+        """
+        Returns the number of pages from the `/Count` entry of the page tree
+        root, and only walks the page tree if that entry is missing.
+        """
+        pages = resolve1(self.doc.catalog.get("Pages"))
+        if isinstance(pages, dict):
+            count = resolve1(pages.get("Count"))
+            if isinstance(count, int) and count >= 0:
+                return count
+        return sum(1 for _ in PDFPage.create_pages(self.doc))
+
+    def parse_metadata(self):
+        """ Read info dict, XMP metadata and page count (no page content) """
+        doc = self.doc
+        with timed(self.stats, "metadata.info"):
+            if doc.info:
+                for k in doc.info[0]:
+                    v = doc.info[0][k]
+                    # print(repr(v), type(v))
+                    if isinstance(v, (bytes, str, unicode)):
+                        self.metadata[k] = make_compat_str(v)
+                    elif isinstance(v, (psparser.PSLiteral, psparser.PSKeyword)):
+                        self.metadata[k] = make_compat_str(v.name)
 
         # Secret Metadata
         if "Metadata" in doc.catalog:
-            metadata = resolve1(doc.catalog["Metadata"]).get_data()
-            # print(metadata)  # The raw XMP metadata
-            # print(xmp_to_dict(metadata))
-            self.metadata.update(xmp_to_dict(metadata))
-            # print("---")
-
-        # Extract Content
-        text_io = BytesIO()
-        rsrcmgr = PDFResourceManager(caching=True)
-        converter = TextConverter(
-            rsrcmgr, text_io, codec="utf-8", laparams=LAParams(), imagewriter=None
-        )
-        interpreter = PDFPageInterpreter(rsrcmgr, converter)
+            with timed(self.stats, "metadata.xmp"):
+                metadata = resolve1(doc.catalog["Metadata"]).get_data()
+                # print(metadata)  # The raw XMP metadata
+                # print(xmp_to_dict(metadata))
+                self.metadata.update(xmp_to_dict(metadata))
+                # print("---")
 
-        self.metadata["Pages"] = 0
-        self.curpage = 0
-        for page in PDFPage.get_pages(
-            self.pdf_stream,
-            pagenos=pagenos,
-            maxpages=maxpages,
-            password=password,
-            caching=True,
-            check_extractable=False,
-        ):
-            # Read page contents
-            interpreter.process_page(page)
-            self.metadata["Pages"] += 1
-            self.curpage += 1
-
-            # Collect URL annotations
-            # try:
-            if page.annots:
-                refs = self.resolve_PDFObjRef(page.annots)
-                if refs:
-                    if isinstance(refs, list):
-                        for ref in refs:
-                            if ref:
-                                self.references.add(ref)
-                    elif isinstance(refs, Reference):
-                        self.references.add(refs)
-
-            # except Exception as e:
-            # logger.warning(str(e))
+        with timed(self.stats, "metadata.page_count"):
+            self.metadata["Pages"] = self.get_page_count()
 
         # Remove empty metadata entries
         self.metadata_cleanup()
+        self.metadata_parsed = True
 
-        # Get text from stream
-        self.text = text_io.getvalue().decode("utf-8")
-        text_io.close()
-        converter.close()
+    def parse_content(self):
+        """
+        Interpret all pages to extract the text and references. Pages of an
+        earlier revision (see `set_previous_result`) which did not change
+        are not interpreted again.
+        """
+        if self.previous_pages:
+            pages = self.iter_changed_page_content()
+        elif self.jobs > 1 and self.source is not None:
+            pages = self.iter_page_content_parallel()
+        else:
+            pages = self.iter_page_content()
+
+        texts = []
+        text_references = set()
+        for pageno, text, refs in self.iter_within_budget(pages):
+            texts.append(text)
+            self.references.update(refs)
+            self.curpage = pageno + 1
+            self.pages.append((pageno, len(text), refs))
+
+            # Extract URL references from the text of each page, to know
+            # their page and offset (urls never continue across pages)
+            text_references.update(extract_references(text, pageno + 1, self.stats))
+        self.text = "".join(texts)
         # print(self.text)
 
-        # Extract URL references from text
-        for url in extractor.extract_urls(self.text):
-            self.references.add(Reference(url, self.curpage))
+        # The text of the last page was cut, it can't be reused as a whole page
+        if self.truncated == "max_text_bytes" and self.pages:
+            self.pages.pop()
+
+        # Annotations take precedence over text references of the same uri
+        self.references.update(text_references)
+        if self.stats is not None:
+            self.stats.count("references", len(self.references))
+
+        self.content_parsed = True
+
+    def iter_within_budget(self, pages):
+        """
+        Yields the `(pageno, text, refs)` of `pages` until the budget is
+        exceeded, with the text cut to `max_text_bytes`, and sets `truncated`
+        """
+        budget = self.budget
+        self.truncated = None
+        if budget is not None:
+            budget.start()
+        count = 0
+        try:
+            for pageno, text, refs in pages:
+                if budget is not None:
+                    text = budget.add_text(text)
+                count += 1
+                yield pageno, text, refs
+                if budget is not None:
+                    budget.check()
+        except BudgetExceededError as e:
+            logger.info("Extraction stopped after %s pages: %s" % (count, e))
+            self.truncated = e.budget
+
+        if not self.truncated and self.maxpages and self.get_page_count() > self.maxpages:
+            self.truncated = "max_pages"
+
+    def iter_changed_page_content(self):
+        """
+        Yields `(pageno, text, refs)` of the selected pages like
+        `iter_page_content`, but only interprets the pages which are not
+        unchanged pages of the previous revision
+        """
+        fingerprints = self.get_page_fingerprints()
+        selected = self.get_selected_pagenos(len(fingerprints))
+        reused = {}
+        for pageno in selected:
+            if fingerprints[pageno] in self.previous_pages:
+                reused[pageno] = self.previous_pages[fingerprints[pageno]]
+        logger.debug("Reusing %s of %s pages" % (len(reused), len(selected)))
+        if self.stats is not None:
+            self.stats.count("pages.reused", len(reused))
+
+        pagenos = [pageno for pageno in selected if pageno not in reused]
+        if not pagenos:
+            pages = iter([])
+        elif self.jobs > 1 and self.source is not None:
+            pages = self.iter_page_content_parallel(pagenos)
+        else:
+            pages = self.iter_page_content(set(pagenos))
+
+        for pageno in selected:
+            if pageno in reused:
+                text, refs = reused[pageno]
+                yield pageno, text, [
+                    Reference(ref.ref, pageno + 1, ref.reftype, ref.offset, ref.bbox)
+                    for ref in refs
+                ]
+            else:
+                yield next(pages)
+
+    def get_result(self):
+        """ Like `ReaderBackend.get_result`, plus the pages to reuse for a later revision """
+        result = ReaderBackend.get_result(self)
+        fingerprints = self.get_page_fingerprints()
+        result["pages"] = []
+        for pageno, length, refs in self.pages:
+            result["pages"].append([fingerprints[pageno], length, references_as_lists(refs)])
+        return result
+
+    def set_previous_result(self, result):
+        """
+        Remembers the pages of the result of an earlier revision of this
+        PDF (before incremental updates), to reuse unchanged pages
+        """
+        offset = 0
+        for fingerprint, length, refs in result.get("pages", []):
+            text = result["text"][offset : offset + length]  # noqa: E203
+            offset += length
+            self.previous_pages[fingerprint] = (text, references_from_lists(refs))
 
-        for ref in extractor.extract_arxiv(self.text):
-            self.references.add(Reference(ref, self.curpage))
+    def get_page_fingerprints(self):
+        """
+        Returns a fingerprint of each page (by 0-based page number), which
+        changes if any object of the page (content streams, resources,
+        annotations, ...) is changed by an incremental update. Objects are
+        identified by their position in the file: unchanged objects keep
+        it, updated objects are appended with a new xref entry.
+        """
+        memo = {}
+        fingerprints = []
+        for page in PDFPage.create_pages(self.doc):
+            location = (page.pageid, self.get_location(page.pageid))
+            fingerprints.append(self.get_object_fingerprint(page.attrs, memo, location))
+        return fingerprints
+
+    def get_location(self, objid):
+        """ Position of an object in the newest xref section which contains it """
+        for xref in self.doc.xrefs:
+            try:
+                return xref.get_pos(objid)
+            except KeyError:
+                continue
+        return None
+
+    def get_object_fingerprint(self, obj, memo, prefix=None):
+        """
+        Returns a hash of an object and all objects it references (except
+        parent and other pages), memoized by object id in `memo`
+        """
+        sha1 = hashlib.sha1(repr(prefix).encode("utf-8"))
+
+        def add(obj):
+            if isinstance(obj, PDFObjRef):
+                if obj.objid not in memo:
+                    memo[obj.objid] = None  # Cycles
+                    try:
+                        target = obj.resolve()
+                    except Exception:
+                        target = None
+                    if isinstance(target, dict) and target.get("Type") is LITERAL_PAGE:
+                        target = None  # Link to another page
+                    memo[obj.objid] = self.get_object_fingerprint(
+                        target, memo, (obj.objid, self.get_location(obj.objid))
+                    )
+                sha1.update(("R%s:%s" % (obj.objid, memo[obj.objid])).encode("utf-8"))
+            elif isinstance(obj, PDFStream):
+                # The data is covered by the location of the stream object
+                sha1.update(b"S")
+                add(obj.attrs)
+            elif isinstance(obj, dict):
+                sha1.update(b"<<")
+                for key in sorted(obj):
+                    if key not in ("Parent", "P"):
+                        sha1.update(repr(key).encode("utf-8"))
+                        add(obj[key])
+                sha1.update(b">>")
+            elif isinstance(obj, list):
+                sha1.update(b"[")
+                for item in obj:
+                    add(item)
+                sha1.update(b"]")
+            else:
+                sha1.update(repr(obj).encode("utf-8"))
 
-        for ref in extractor.extract_doi(self.text):
-            self.references.add(Reference(ref, self.curpage))
+        add(obj)
+        return sha1.hexdigest()
 
-    def resolve_PDFObjRef(self, obj_ref):
+    def iter_pages(self):
+        """
+        Interpret the pages and yield a `Page` with the text and references
+        of each page as soon as it is parsed. Nothing is kept in memory, so
+        the pages are parsed again on every call.
+        """
+        if self.jobs > 1 and self.source is not None:
+            pages = self.iter_page_content_parallel()
+        else:
+            pages = self.iter_page_content()
+
+        for pageno, text, refs in self.iter_within_budget(pages):
+            yield Page(pageno + 1, text, refs, extract_references(text, pageno + 1, self.stats))
+
+    def get_selected_pagenos(self, page_count=None):
+        """ Returns the page numbers (0-based) selected by `pagenos` and `maxpages` """
+        pagenos = range(self.get_page_count() if page_count is None else page_count)
+        if self.maxpages:
+            pagenos = pagenos[: self.maxpages]
+        return [pageno for pageno in pagenos if not self.pagenos or pageno in self.pagenos]
+
+    def iter_page_content(self, pagenos=None):
+        """
+        Interpret the pages one by one and yield `(pageno, text, refs)` for
+        each, where `refs` is the list of references from the page annotations.
+        `pagenos` restricts the pages (defaults to the backend's `pagenos`).
+        """
+        if pagenos is None:
+            pagenos = self.pagenos
+
+        text_io = BytesIO()
+        rsrcmgr = PDFResourceManager(caching=True)
+        if self.layout == "none":
+            converter = RawTextConverter(rsrcmgr, text_io, codec="utf-8")
+        else:
+            converter = TextConverter(
+                rsrcmgr, text_io, codec="utf-8", laparams=LAParams(), imagewriter=None
+            )
+        if self.budget is None:
+            interpreter = PDFPageInterpreter(rsrcmgr, converter)
+        else:
+            interpreter = BudgetInterpreter(rsrcmgr, converter, self.budget)
+
+        try:
+            for pageno, page in enumerate(PDFPage.create_pages(self.doc)):
+                if pagenos and pageno not in pagenos:
+                    continue
+
+                # Read page contents
+                self.curpage = pageno + 1
+                started = clock()
+                interpreter.process_page(page)
+                text = text_io.getvalue().decode("utf-8")
+                text_io.seek(0)
+                text_io.truncate()
+                seconds = clock() - started
+
+                with timed(self.stats, "pages.annotations"):
+                    refs = self.get_annotation_references(page)
+                if self.stats is not None:
+                    self.stats.add_page(pageno + 1, seconds, len(text), len(refs))
+
+                yield pageno, text, refs
+
+                if self.maxpages and self.maxpages <= pageno + 1:
+                    break
+        finally:
+            text_io.close()
+            converter.close()
+
+    def iter_page_content_parallel(self, pagenos=None):
+        """
+        Like `iter_page_content`, but splits the selected pages (or the
+        given list of `pagenos`) into slices which are interpreted by
+        `self.jobs` worker processes. Each worker opens the document once
+        from `self.source` (a filename or the content); results are yielded
+        in page order.
+        """
+        selected = self.get_selected_pagenos() if pagenos is None else pagenos
+        if not selected:
+            return
+
+        # More slices than workers, to balance pages of different complexity
+        n_slices = min(len(selected), self.jobs * 4)
+        size = -(-len(selected) // n_slices)
+        tasks = [
+            selected[start : start + size] for start in range(0, len(selected), size)  # noqa: E203
+        ]
+
+        # The source is sent once to each worker, not with every slice. The
+        # workers check the memory budget themselves (the timeout is checked here)
+        max_memory = None if self.budget is None else self.budget.max_memory
+        pool = multiprocessing.Pool(
+            min(self.jobs, len(tasks)),
+            initializer=_init_worker,
+            initargs=(self.source, self.password, self.layout, max_memory),
+        )
+        try:
+            results = pool.imap(_extract_pages, tasks)
+            for _ in tasks:
+                # Budgets are checked here, the workers are terminated if exceeded
+                timeout = None if self.budget is None else self.budget.get_remaining_time()
+                try:
+                    with timed(self.stats, "pages.parallel"):
+                        pages = results.next(timeout)
+                except multiprocessing.TimeoutError:
+                    raise BudgetExceededError("timeout")
+                if self.stats is not None:
+                    self.stats.count("pages", len(pages))
+                for page in pages:
+                    yield page
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def get_annotation_references(self, page):
+        """ Returns the references of all URL annotations of a page """
+        ret = []
+        # try:
+        if page.annots:
+            refs = self.resolve_PDFObjRef(page.annots)
+            if refs:
+                if isinstance(refs, list):
+                    for ref in refs:
+                        if ref:
+                            ret.append(ref)
+                elif isinstance(refs, Reference):
+                    ret.append(refs)
+
+        # except Exception as e:
+        # logger.warning(str(e))
+        return ret
+
+    def resolve_PDFObjRef(self, obj_ref, bbox=None):
         """
         Resolves PDFObjRef objects. Returns either None, a Reference object or
-        a list of Reference objects.
+        a list of Reference objects. References get the `Rect` of their
+        annotation as `bbox`.
         """
         if isinstance(obj_ref, list):
-            return [self.resolve_PDFObjRef(item) for item in obj_ref]
+            return [self.resolve_PDFObjRef(item, bbox) for item in obj_ref]
 
         # print(">", obj_ref, type(obj_ref))
         if not isinstance(obj_ref, PDFObjRef):
@@ -287,22 +843,81 @@ class PDFMinerBackend(ReaderBackend):
                 ref = obj_resolved.decode("utf-8")
             else:
                 ref = obj_resolved
-            return Reference(ref, self.curpage)
+            return Reference(ref, self.curpage, bbox=bbox)
 
         if isinstance(obj_resolved, list):
-            return [self.resolve_PDFObjRef(o) for o in obj_resolved]
+            return [self.resolve_PDFObjRef(o, bbox) for o in obj_resolved]
+
+        if "Rect" in obj_resolved:
+            bbox = get_bbox(obj_resolved["Rect"]) or bbox
 
         if "URI" in obj_resolved:
             if isinstance(obj_resolved["URI"], PDFObjRef):
-                return self.resolve_PDFObjRef(obj_resolved["URI"])
+                return self.resolve_PDFObjRef(obj_resolved["URI"], bbox)
 
         if "A" in obj_resolved:
             if isinstance(obj_resolved["A"], PDFObjRef):
-                return self.resolve_PDFObjRef(obj_resolved["A"])
+                return self.resolve_PDFObjRef(obj_resolved["A"], bbox)
 
             if "URI" in obj_resolved["A"]:
                 # print("->", a["A"]["URI"])
-                return Reference(obj_resolved["A"]["URI"].decode("utf-8"), self.curpage)
+                uri = obj_resolved["A"]["URI"].decode("utf-8")
+                return Reference(uri, self.curpage, bbox=bbox)
+
+
+def get_bbox(rect):
+    """ Returns `(x0, y0, x1, y1)` of a PDF rectangle, or None if invalid """
+    rect = resolve1(rect)
+    if not isinstance(rect, list) or len(rect) != 4:
+        return None
+    try:
+        x0, y0, x1, y1 = [float(resolve1(v)) for v in rect]
+    except (TypeError, ValueError):
+        return None
+    return min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+
+
+# Document of a worker process of `PDFMinerBackend.iter_page_content_parallel`
+_worker_backend = None
+
+
+def _init_worker(source, password, layout, max_memory=None):
+    """ Opens the document in a worker process (`source` is a filename or the content) """
+    global _worker_backend
+    if isinstance(source, bytes):
+        stream = BytesIO(source)
+    else:
+        stream = open(source, "rb")
+    budget = Budget(max_memory=max_memory) if max_memory else None
+    _worker_backend = PDFMinerBackend(stream, password=password, layout=layout, budget=budget)
+
+
+def _extract_pages(pagenos):
+    """
+    Worker of `iter_page_content_parallel`: returns `(pageno, text, refs)` of
+    the pages. Raises `BudgetExceededError` if the worker exceeds `max_memory`.
+    """
+    budget = _worker_backend.budget
+    if budget is None:
+        return list(_worker_backend.iter_page_content(pagenos=set(pagenos)))
+
+    budget.start()
+    pages = []
+    for page in _worker_backend.iter_page_content(pagenos=set(pagenos)):
+        pages.append(page)
+        budget.check()
+    return pages
+
+
+class ResultBackend(ReaderBackend):
+    """ Reader for a result of `ReaderBackend.get_result` (eg. from the cache) """
+
+    def __init__(self, result):
+        ReaderBackend.__init__(self)
+        self.metadata = result["metadata"]
+        self.text = result["text"]
+        self.references.update(references_from_lists(result["references"]))
+        self.truncated = result.get("truncated")
 
 
 class TextBackend(ReaderBackend):
@@ -311,11 +926,4 @@ class TextBackend(ReaderBackend):
         self.text = stream.read()
 
         # Extract URL references from text
-        for url in extractor.extract_urls(self.text):
-            self.references.add(Reference(url))
-
-        for ref in extractor.extract_arxiv(self.text):
-            self.references.add(Reference(ref))
-
-        for ref in extractor.extract_doi(self.text):
-            self.references.add(Reference(ref))
+        self.references.update(extract_references(self.text))
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Batch mode: process many PDFs with a pool of worker processes, and get one
+result per PDF as soon as it is finished.
+
+>>> from pdfx.batch import find_pdfs, process_batch
+>>> for result in process_batch(find_pdfs(["papers/", "other.pdf"])):
+...     print(result["source"]["location"], result.get("error"))
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sys
+import logging
+import functools
+import multiprocessing
+
+import pdfx
+
+IS_PY2 = sys.version_info < (3, 0)
+if not IS_PY2:
+    # Python 3
+    unicode = str
+
+logger = logging.getLogger(__name__)
+
+
+def find_pdfs(sources, stdin=None):
+    """
+    Expands a list of sources into PDF filenames and URLs:
+    - a directory is searched recursively for `*.pdf` files
+    - `-` reads a newline-delimited list of filenames and URLs from stdin
+    - everything else (filenames, URLs) is passed through as-is
+    """
+    for source in sources:
+        if source == "-":
+            for line in stdin or sys.stdin:
+                line = line.strip()
+                if line:
+                    yield line
+
+        elif os.path.isdir(source):
+            for dirpath, dirnames, filenames in os.walk(source):
+                dirnames.sort()
+                for fn in sorted(filenames):
+                    if fn.lower().endswith(".pdf"):
+                        yield os.path.join(dirpath, fn)
+
+        else:
+            yield source
+
+
+def process_pdf(uri, metadata_only=False, **options):
+    """
+    Worker of `process_batch`. Returns the summary of a PDF (same as `PDFx.summary`,
+    or `PDFx.metadata_summary` with `metadata_only`), or the source and an
+    `error` message if it could not be processed.
+    """
+    try:
+        if metadata_only:
+            options.pop("cache", None)
+            return pdfx.PDFx(uri, **options).metadata_summary
+        return pdfx.PDFx(uri, **options).summary
+    except Exception as e:
+        logger.debug("Error processing '%s': %s" % (uri, e))
+        return {
+            "source": {"location": uri},
+            "error": "%s: %s" % (type(e).__name__, unicode(e)),
+        }
+
+
+def process_batch(uris, jobs=None, **options):
+    """
+    Processes an iterable of PDF filenames or URLs with `jobs` worker
+    processes (default: number of CPUs), and yields the results in the
+    order they are finished. `options` are passed on to `pdfx.PDFx`.
+    """
+    worker = functools.partial(process_pdf, **options)
+    pool = multiprocessing.Pool(jobs or multiprocessing.cpu_count())
+    try:
+        for result in pool.imap_unordered(worker, uris):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Budgets of an extraction, so that a pathological PDF (deeply nested
+XObjects, giant content streams, ...) returns a partial result instead of
+blocking a worker indefinitely.
+
+>>> budget = Budget(timeout=30, max_text_bytes=10 * 1024 * 1024)
+>>> budget.start()
+>>> text = budget.add_text(page_text)  # cut to the remaining text budget
+>>> budget.check()  # raises BudgetExceededError
+
+The budgets are checked between pages, and every `CHECK_INTERVAL` operators
+while a page is interpreted (see `backends.BudgetInterpreter`).
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import sys
+import time
+import logging
+
+from .exceptions import BudgetExceededError
+
+try:
+    import resource
+
+    PAGE_SIZE = resource.getpagesize()
+except ImportError:
+    # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Number of content stream operators between two checks of the budget
+CHECK_INTERVAL = 256
+
+# Budgets which give the same result on every run (and can be cached)
+DETERMINISTIC_BUDGETS = ("max_pages", "max_text_bytes")
+
+
+def get_memory_usage():
+    """
+    Returns the resident memory of this process in bytes, or None if unknown.
+    Without /proc (eg. macOS) this is the peak, which never decreases.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Budget(object):
+    """
+    Limits of an extraction: `timeout` (wall-clock seconds from `start`),
+    `max_text_bytes` (utf-8 bytes of the text) and `max_memory` (resident
+    memory of the process, in bytes).
+    """
+
+    def __init__(self, timeout=None, max_text_bytes=None, max_memory=None):
+        self.timeout = timeout
+        self.max_text_bytes = max_text_bytes
+        self.max_memory = max_memory
+        if max_memory and resource is None:
+            logger.warning("max_memory is not supported on this platform")
+        self.deadline = None
+        self.text_bytes = 0
+        self.exceeded = None
+        self.ticks = 0
+
+    def start(self):
+        """ Starts an extraction: the clock of the timeout, and counting the text """
+        if self.timeout is not None:
+            self.deadline = time.time() + self.timeout
+        self.text_bytes = 0
+        self.exceeded = None
+        self.ticks = 0
+
+    def get_remaining_time(self):
+        """ Seconds until the timeout, or None without timeout """
+        if self.deadline is None:
+            return None
+        return max(0, self.deadline - time.time())
+
+    def check(self):
+        """ Raises `BudgetExceededError` if a budget is exceeded """
+        if self.exceeded is None:
+            if self.deadline is not None and time.time() >= self.deadline:
+                self.exceeded = "timeout"
+            elif self.max_memory and (get_memory_usage() or 0) > self.max_memory:
+                self.exceeded = "max_memory"
+        if self.exceeded is not None:
+            raise BudgetExceededError(self.exceeded)
+
+    def tick(self):
+        """ Called for each operator of a content stream """
+        self.ticks += 1
+        if self.ticks % CHECK_INTERVAL == 0:
+            self.check()
+
+    def add_text(self, text):
+        """
+        Counts the text of a page, and returns it cut to the remaining
+        `max_text_bytes` (the next `check` raises then)
+        """
+        if not self.max_text_bytes:
+            return text
+        data = text.encode("utf-8")
+        remaining = self.max_text_bytes - self.text_bytes
+        if len(data) > remaining:
+            self.exceeded = "max_text_bytes"
+            data = data[: max(0, remaining)]
+            text = data.decode("utf-8", "ignore")
+        self.text_bytes += len(data)
+        return text
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent on-disk cache of extraction results.
+
+Results are keyed by the SHA-256 of the PDF bytes, the pdfx version and the
+extraction options, so a PDF is only parsed once no matter where it is read
+from. The least recently used results are evicted when the cache grows
+larger than `max_size` bytes.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import json
+import codecs
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAX_SIZE_DEFAULT = 1024 * 1024 * 1024  # 1 GB
+
+CHUNK_SIZE = 1024 * 1024
+
+# Puts between two scans of the cache directory, which also count the
+# results stored by other processes using the same directory
+EVICT_INTERVAL = 100
+
+# End of a PDF revision. Incremental updates are appended after it.
+EOF_MARKER = b"%%EOF"
+
+
+def hash_stream(stream):
+    """ Returns the SHA-256 hex digest of a seekable stream (and rewinds it) """
+    sha256 = hashlib.sha256()
+    stream.seek(0)
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        sha256.update(chunk)
+    stream.seek(0)
+    return sha256.hexdigest()
+
+
+def find_revision_ends(stream):
+    """
+    Returns the offsets after each `%%EOF` marker (and its end of line) of a
+    seekable stream, except at the very end: where the earlier revisions of
+    an incrementally updated PDF end.
+    """
+    candidates = set()
+    tail = b""
+    offset = 0  # Stream offset of `tail`
+    stream.seek(0)
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        data = tail + chunk
+        pos = data.find(EOF_MARKER)
+        while pos != -1:
+            end = pos + len(EOF_MARKER)
+            candidates.add(offset + end)
+            # The end of line can be \r, \n or \r\n (and may be in the next chunk)
+            if data[end : end + 1] in (b"\r", b"\n"):  # noqa: E203
+                candidates.add(offset + end + 1)
+            if data[end : end + 2] == b"\r\n":  # noqa: E203
+                candidates.add(offset + end + 2)
+            pos = data.find(EOF_MARKER, end)
+        if not chunk:
+            break
+
+        # Keep enough for a marker and its end of line spanning the chunks
+        keep = min(len(data), len(EOF_MARKER) + 1)
+        tail = data[len(data) - keep :]  # noqa: E203
+        offset += len(data) - keep
+    stream.seek(0)
+
+    length = offset + len(tail)
+    return sorted(end for end in candidates if end < length)
+
+
+def hash_stream_prefixes(stream, ends):
+    """ Returns the SHA-256 hex digests of the first `end` bytes of a stream, for all `ends` """
+    sha256 = hashlib.sha256()
+    digests = []
+    pos = 0
+    stream.seek(0)
+    for end in sorted(ends):
+        while pos < end:
+            chunk = stream.read(min(CHUNK_SIZE, end - pos))
+            if not chunk:
+                break
+            sha256.update(chunk)
+            pos += len(chunk)
+        digests.append(sha256.copy().hexdigest())
+    stream.seek(0)
+    return digests
+
+
+class ResultCache(object):
+    """
+    Cache of extraction results (JSON-serializable dicts) in `cache_dir`
+
+    >>> cache = ResultCache("/tmp/pdfx-cache")
+    >>> key = cache.get_key(stream, {"layout": "normal"})
+    >>> result = cache.get(key)
+    >>> if result is None:
+    ...     cache.put(key, {...})
+    """
+
+    def __init__(self, cache_dir, max_size=CACHE_MAX_SIZE_DEFAULT):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.size = None  # Size of the cache at the last scan, plus the puts since
+        self.puts = 0
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def get_key(self, stream, options=None):
+        """ Cache key of a PDF stream, for this pdfx version and the given options """
+        return self.make_key(hash_stream(stream), options)
+
+    def make_key(self, content_hash, options=None):
+        from . import __version__
+
+        key = "%s|%s|%s" % (
+            content_hash,
+            __version__,
+            json.dumps(options or {}, sort_keys=True),
+        )
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get_previous_revision(self, stream, options=None):
+        """
+        Returns the cached result of the newest earlier revision of an
+        incrementally updated PDF (a prefix of it ending with `%%EOF`), or None
+        """
+        ends = find_revision_ends(stream)
+        for content_hash in reversed(hash_stream_prefixes(stream, ends)):
+            result = self.get(self.make_key(content_hash, options))
+            if result is not None:
+                return result
+        return None
+
+    def get_filename(self, key):
+        return os.path.join(self.cache_dir, "%s.json" % key)
+
+    def get(self, key):
+        """ Returns the cached result, or None """
+        fn = self.get_filename(key)
+        try:
+            with codecs.open(fn, "r", "utf-8") as f:
+                result = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+        # Mark as recently used
+        try:
+            os.utime(fn, None)
+        except OSError:
+            pass
+        logger.debug("Cache hit: %s" % key)
+        return result
+
+    def put(self, key, result):
+        """
+        Stores a result, and evicts old results if the cache is too large.
+        The directory is only scanned if the tracked size exceeds `max_size`,
+        and every `EVICT_INTERVAL` puts.
+        """
+        fn = self.get_filename(key)
+        fn_tmp = "%s.%s.tmp" % (fn, os.getpid())
+        with codecs.open(fn_tmp, "w", "utf-8") as f:
+            json.dump(result, f)
+        size = os.path.getsize(fn_tmp)
+        try:
+            size -= os.path.getsize(fn)
+        except OSError:
+            pass
+        # Atomic, so concurrent readers never see a partial file
+        os.replace(fn_tmp, fn)
+
+        self.puts += 1
+        if self.size is not None:
+            self.size += size
+        if self.size is None or self.size > self.max_size or self.puts % EVICT_INTERVAL == 0:
+            self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used results until the cache fits
+        `max_size`, and updates the tracked size
+        """
+        entries = []
+        total_size = 0
+        for fn in os.listdir(self.cache_dir):
+            if not fn.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, fn))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, fn))
+            total_size += stat.st_size
+
+        for _, size, fn in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, fn))
+                logger.debug("Cache eviction: %s" % fn)
+            except OSError:
+                pass
+            total_size -= size
+        self.size = total_size
@@ -12,7 +12,7 @@ import json
 import codecs
 
 import pdfx
-from pdfx.downloader import check_refs
+from pdfx.linkcache import TTL_SUCCESS_DEFAULT, TTL_FAILURE_DEFAULT
 
 
 IS_PY2 = sys.version_info < (3, 0)
@@ -43,10 +43,20 @@ def create_parser():
         description="Extract metadata and references from a PDF, and "
         "optionally download all referenced PDFs. Visit "
         "https://www.metachris.com/pdfx for more information.",
-        epilog="",
+        epilog="Run 'pdfx serve -h' for the extraction server.",
     )
 
-    parser.add_argument("pdf", help="Filename or URL of a PDF file")
+    parser.add_argument("pdf", nargs="?", help="Filename or URL of a PDF file")
+
+    parser.add_argument(
+        "-b",
+        "--batch",
+        metavar="SOURCE",
+        nargs="+",
+        help="Process many PDFs and output one JSON result per line. SOURCE can "
+        "be a filename, URL, directory (searched recursively) or '-' to read "
+        "a list of filenames and URLs from stdin",
+    )
 
     parser.add_argument(
         "-d",
@@ -59,6 +69,65 @@ def create_parser():
         "-c", "--check-links", action="store_true", help="Check for broken links"
     )
 
+    parser.add_argument(
+        "--engine",
+        choices=["async", "threads"],
+        help="HTTP client of -c and -d: asyncio with connection pooling, or "
+        "urllib in 7 threads (default: threads if a proxy is configured, else async)",
+    )
+
+    parser.add_argument(
+        "--max-connections",
+        metavar="N",
+        type=int,
+        help="Maximum number of concurrent requests of -c and -d (default: 100)",
+    )
+
+    parser.add_argument(
+        "--max-per-host",
+        metavar="N",
+        type=int,
+        help="Maximum number of concurrent requests per host of -c and -d (default: 6)",
+    )
+
+    parser.add_argument(
+        "--rate-limit",
+        metavar="N",
+        type=float,
+        help="Maximum number of requests per second of -c and -d (default: unlimited)",
+    )
+
+    parser.add_argument(
+        "--max-retries",
+        metavar="N",
+        type=int,
+        help="Retries of -c and -d if a host answers 429 or 503 with Retry-After "
+        "(default: 3). The host is paused meanwhile, other hosts continue.",
+    )
+
+    parser.add_argument(
+        "--link-cache",
+        metavar="FILE",
+        help="Cache the results of -c in this SQLite file, and skip urls "
+        "checked within the TTL",
+    )
+
+    parser.add_argument(
+        "--link-cache-ttl",
+        metavar="SECONDS",
+        type=int,
+        default=TTL_SUCCESS_DEFAULT,
+        help="Time to keep working links in the link cache (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--link-cache-ttl-failure",
+        metavar="SECONDS",
+        type=int,
+        default=TTL_FAILURE_DEFAULT,
+        help="Time to keep broken links in the link cache (default: %(default)s)",
+    )
+
     parser.add_argument(
         "-j",
         "--json",
@@ -85,6 +154,103 @@ def create_parser():
         help="Only extract text (no metadata or references)",
     )
 
+    parser.add_argument(
+        "--metadata-only",
+        action="store_true",
+        help="Only output the metadata and page count, without parsing the pages "
+        "(much faster for large PDFs)",
+    )
+
+    parser.add_argument(
+        "--layout",
+        choices=["normal", "none"],
+        default="normal",
+        help="Text layout analysis. 'none' is much faster if only the "
+        "references are needed, but the text is not in reading order "
+        "(default: normal)",
+    )
+
+    parser.add_argument(
+        "--jobs",
+        metavar="N",
+        type=int,
+        help="Number of processes used to extract the pages (default: 1), or "
+        "to process the PDFs in batch mode (default: number of CPUs)",
+    )
+
+    parser.add_argument(
+        "--max-download-size",
+        metavar="BYTES",
+        type=int,
+        help="Abort downloading a remote PDF if it is larger than this",
+    )
+
+    parser.add_argument(
+        "--download-timeout",
+        metavar="SECONDS",
+        type=float,
+        help="Timeout for connecting to and reading from a remote PDF "
+        "(default: 10s to connect, 60s per read)",
+    )
+
+    parser.add_argument(
+        "--timeout",
+        metavar="SECONDS",
+        type=float,
+        help="Stop interpreting the pages after this time, and output the "
+        "results of the pages parsed so far (flagged as truncated)",
+    )
+
+    parser.add_argument(
+        "--max-pages",
+        metavar="N",
+        type=int,
+        help="Only interpret the first N pages",
+    )
+
+    parser.add_argument(
+        "--max-text-bytes",
+        metavar="BYTES",
+        type=int,
+        help="Stop interpreting the pages when the text exceeds this size",
+    )
+
+    parser.add_argument(
+        "--max-memory",
+        metavar="BYTES",
+        type=int,
+        help="Stop interpreting the pages when the process (with --jobs: a "
+        "worker process) uses more memory",
+    )
+
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Output the timings of the extraction stages and of each page "
+        "(in the JSON output with -j and --batch, else on stderr)",
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIRECTORY",
+        help="Cache extraction results in this directory, and skip parsing "
+        "PDFs which are already in the cache",
+    )
+
+    parser.add_argument(
+        "--http-cache",
+        metavar="DIRECTORY",
+        help="Keep downloaded PDFs in this directory, and only download them "
+        "again if they were modified (using ETag / Last-Modified)",
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Output text and references of each page as one JSON line, "
+        "as soon as the page is parsed",
+    )
+
     parser.add_argument(
         "-o", "--output-file", help="Output to specified file instead of console"
     )
@@ -97,14 +263,19 @@ def create_parser():
     return parser
 
 
-def get_text_output(pdf, args):
-    """ Normal output of infos of PDFx instance """
-    # Metadata
-    ret = ""
-    ret += "Document infos:\n"
+def get_metadata_output(pdf):
+    """ Text output of the metadata of PDFx instance """
+    ret = "Document infos:\n"
     for k, v in sorted(pdf.get_metadata().items()):
         if v:
             ret += "- %s = %s\n" % (k, parse_str(v).strip("/"))
+    return ret
+
+
+def get_text_output(pdf, args):
+    """ Normal output of infos of PDFx instance """
+    # Metadata
+    ret = get_metadata_output(pdf)
 
     # References
     ref_cnt = pdf.get_references_count()
@@ -145,17 +316,132 @@ def print_to_console(text):
     sys.stdout.write("\n")
 
 
-def main():
-    parser = create_parser()
-    args = parser.parse_args()
+def get_pdfx_options(args):
+    """ Returns the keyword arguments for `pdfx.PDFx` (except jobs) """
+    return {
+        "layout": args.layout,
+        "max_download_size": args.max_download_size,
+        "download_timeout": args.download_timeout or pdfx.sources.TIMEOUT_DEFAULT,
+        "cache": args.cache_dir,
+        "http_cache": args.http_cache,
+        "timeout": args.timeout,
+        "max_pages": args.max_pages,
+        "max_text_bytes": args.max_text_bytes,
+        "max_memory": args.max_memory,
+        "stats": args.stats or None,
+    }
+
+
+def get_client_options(args):
+    """ Returns the HTTP client options for `check_refs` and `download_urls` """
+    options = {
+        "engine": args.engine,
+        "max_connections": args.max_connections,
+        "max_per_host": args.max_per_host,
+        "rate_limit": args.rate_limit,
+        "max_retries": args.max_retries,
+    }
+    return dict((k, v) for k, v in options.items() if v is not None)
+
+
+def output(text, args):
+    """ Output text to `args.output_file` (in utf-8) or to the console """
+    if args.output_file:
+        with codecs.open(args.output_file, "w", "utf-8") as f:
+            f.write(text)
+    else:
+        print_to_console(text)
 
-    # if args.debug:
-    #     logging.basicConfig(
-    #             level=logging.DEBUG,
-    #             format='%(levelname)s - %(module)s - %(message)s')
+
+def output_json_lines(items, args):
+    """
+    Output each dict of `items` as one JSON line to `args.output_file`
+    or to the console, as soon as it is available
+    """
+    if args.output_file:
+        out = codecs.open(args.output_file, "w", "utf-8")
+    else:
+        out = sys.stdout
+
+    try:
+        for item in items:
+            out.write(json.dumps(item) + "\n")
+            out.flush()
+    finally:
+        if args.output_file:
+            out.close()
+
+
+def print_stats(pdf, args):
+    """ Prints the timings on stderr with --stats (unless they are in the JSON) """
+    if pdf.stats is not None and not args.json:
+        print(pdf.stats, file=sys.stderr)
+
+
+def warn_truncated(pdf):
+    """ Warns on stderr if the extraction was stopped by a budget (eg. --timeout) """
+    if pdf.reader.truncated:
+        print(
+            "Warning: exceeded %s, the results are incomplete" % pdf.reader.truncated,
+            file=sys.stderr,
+        )
+
+
+def run_check_links(pdf, args):
+    """ Checks the url and pdf references for broken links (-c) """
+    from pdfx.downloader import check_refs
+    from pdfx.linkcache import LinkCache
+
+    refs_all = pdf.get_references()
+    refs = [ref for ref in refs_all if ref.reftype in ["url", "pdf"]]
+    print("\nChecking %s URLs for broken links..." % len(refs))
+    link_cache = None
+    if args.link_cache:
+        link_cache = LinkCache(args.link_cache, args.link_cache_ttl, args.link_cache_ttl_failure)
+    check_refs(refs, link_cache=link_cache, **get_client_options(args))
+
+
+def run_stream(pdf, args):
+    """ Output the pages of `pdf` as JSON lines as soon as they are parsed """
+    output_json_lines((page.as_dict() for page in pdf.iter_pages()), args)
+
+
+def run_batch(args):
+    """ Process all PDFs of `args.batch` and output the results as JSON lines """
+    from pdfx.batch import find_pdfs, process_batch
+
+    results = process_batch(
+        find_pdfs(args.batch),
+        jobs=args.jobs,
+        metadata_only=args.metadata_only,
+        **get_pdfx_options(args)
+    )
+    output_json_lines(results, args)
+
+
+def check_args(parser, args):
+    """ Exits with a usage error for invalid combinations of arguments """
+    if args.batch:
+        if args.pdf or args.download_pdfs or args.check_links or args.text:
+            parser.error("--batch cannot be combined with pdf, -d, -c or -t")
+        return
+
+    if not args.pdf:
+        parser.error("the following arguments are required: pdf")
+
+    if args.metadata_only and (args.download_pdfs or args.check_links or args.text or args.stream):
+        parser.error("--metadata-only cannot be combined with -d, -c, -t or --stream")
+
+
+def open_pdf(args):
+    """ Returns the `PDFx` instance of `args.pdf`, or exits with an error """
+    options = get_pdfx_options(args)
+    if args.metadata_only:
+        # A cache miss would parse all pages for the cached result
+        options["cache"] = None
 
     try:
-        pdf = pdfx.PDFx(args.pdf)
+        return pdfx.PDFx(args.pdf, jobs=args.jobs or 1, **options)
     except pdfx.exceptions.FileNotFoundError as e:
         exit_with_error(ERROR_FILE_NOT_FOUND, str(e))
     except pdfx.exceptions.DownloadError as e:
@@ -163,45 +449,59 @@ def main():
     except pdfx.exceptions.PDFInvalidError as e:
         exit_with_error(ERROR_PDF_INVALID, str(e))
 
+
+def main():
+    if sys.argv[1:2] == ["serve"]:
+        from pdfx.server import main as serve
+
+        return serve(sys.argv[2:])
+
+    parser = create_parser()
+    args = parser.parse_args()
+    check_args(parser, args)
+
+    if args.batch:
+        run_batch(args)
+        return
+
+    # if args.debug:
+    #     logging.basicConfig(
+    #             level=logging.DEBUG,
+    #             format='%(levelname)s - %(module)s - %(message)s')
+
+    pdf = open_pdf(args)
+
+    if args.stream:
+        run_stream(pdf, args)
+        return
+
+    if args.metadata_only:
+        if args.json:
+            output(json.dumps(pdf.metadata_summary, indent=4), args)
+        else:
+            output(get_metadata_output(pdf).strip(), args)
+        return
+
     # Perhaps only output text
     if args.text:
-        text = pdf.get_text()
-        if args.output_file:
-            # to file (in utf-8)
-            with codecs.open(args.output_file, "w", "utf-8") as f:
-                f.write(text)
-        else:
-            # to console
-            print_to_console(text)
+        output(pdf.get_text(), args)
+        warn_truncated(pdf)
+        print_stats(pdf, args)
         return
 
     # Print Metadata
     if args.json:
         # in JSON format
-        text = json.dumps(pdf.summary, indent=4)
-        if args.output_file:
-            # to file (in utf-8)
-            with codecs.open(args.output_file, "w", "utf-8") as f:
-                f.write(text)
-        else:
-            # to console
-            print_to_console(text)
+        output(json.dumps(pdf.summary, indent=4), args)
     else:
         # in text format
-        text = get_text_output(pdf, args)
-        if args.output_file:
-            # to file (in utf-8)
-            with codecs.open(args.output_file, "w", "utf-8") as f:
-                f.write(text)
-        else:
-            # to console
-            print_to_console(text)
+        output(get_text_output(pdf, args), args)
+
+    warn_truncated(pdf)
+    print_stats(pdf, args)
 
     if args.check_links:
-        refs_all = pdf.get_references()
-        refs = [ref for ref in refs_all if ref.reftype in ["url", "pdf"]]
-        print("\nChecking %s URLs for broken links..." % len(refs))
-        check_refs(refs)
+        run_check_links(pdf, args)
 
     try:
         if args.download_pdfs:
@@ -209,7 +509,7 @@ def main():
                 "\nDownloading %s pdfs to '%s'..."
                 % (len(pdf.get_references("pdf")), args.download_pdfs)
             )
-            pdf.download_pdfs(args.download_pdfs)
+            pdf.download_pdfs(args.download_pdfs, **get_client_options(args))
             print("All done!")
     except Exception as e:
         exit_with_error(ERROR_DOWNLOAD, str(e))
@@ -1,32 +1,62 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
 from .colorprint import colorprint, OKGREEN, FAIL
-from .threadpool import ThreadPool
-from collections import defaultdict
+from .threadpool import BoundedExecutor, TaskTimeoutError
+from collections import defaultdict, OrderedDict
 import ssl
 import os
 import sys
+import time
+import shutil
+import tempfile
 
 IS_PY2 = sys.version_info < (3, 0)
 
 if IS_PY2:
     # Python 2
     from urllib2 import Request, urlopen, HTTPError, URLError
+    from urllib import getproxies
+    from urlparse import urlsplit
 else:
     # Python 3
-    from urllib.request import Request, urlopen, HTTPError, URLError
+    from urllib.request import Request, urlopen, HTTPError, URLError, getproxies
+    from urllib.parse import urlsplit
 
     unicode = str
 
 
 MAX_THREADS_DEFAULT = 7
 
-# Used to allow downloading files even if https certificate doesn't match
-if hasattr(ssl, "_create_unverified_context"):
-    ssl_unverified_context = ssl._create_unverified_context()
-else:
-    # Not existing in Python 2.6
-    ssl_unverified_context = None
+USER_AGENT = "Mozilla/5.0 (compatible; MSIE 9.0; Windows NT 6.1; Trident/5.0)"
+
+CHUNK_SIZE = 64 * 1024
+
+# Seconds until a request (or a read of its body) times out
+TIMEOUT_DEFAULT = 30
+
+# Used to allow downloading files even if https certificate doesn't match.
+# Created on first use, because loading the certificates is slow.
+ssl_unverified_context = None
+
+
+def get_ssl_unverified_context():
+    global ssl_unverified_context
+    if ssl_unverified_context is None and hasattr(ssl, "_create_unverified_context"):
+        # Not existing in Python 2.6
+        ssl_unverified_context = ssl._create_unverified_context()
+    return ssl_unverified_context
+
+
+def get_default_engine():
+    """
+    Returns the engine of `check_refs` and `download_urls`: "async" (asyncio
+    with connection pooling), or "threads" (urllib in a thread pool) on
+    Python 2 and if a proxy is configured (eg. with `https_proxy`), which
+    only urllib supports
+    """
+    if IS_PY2 or any(scheme in getproxies() for scheme in ("http", "https")):
+        return "threads"
+    return "async"
 
 
 def sanitize_url(url):
@@ -37,53 +67,103 @@ def sanitize_url(url):
     return url
 
 
-def get_status_code(url):
-    """ Perform HEAD request and return status code """
+def interleave_by_host(items, get_url=lambda item: item):
+    """
+    Orders items round-robin by the host of their url, so that requests to
+    different hosts are spread out instead of clustered
+    """
+    by_host = OrderedDict()
+    for item in items:
+        host = urlsplit(sanitize_url(get_url(item))).hostname
+        by_host.setdefault(host, []).append(item)
+
+    queues = list(by_host.values())
+    ret = []
+    for i in range(max(len(queue) for queue in queues) if queues else 0):
+        ret.extend(queue[i] for queue in queues if i < len(queue))
+    return ret
+
+
+def get_status(url, timeout=TIMEOUT_DEFAULT):
+    """ Perform HEAD request and return the status code and the final url (after redirects) """
     try:
         request = Request(sanitize_url(url))
-        request.add_header(
-            "User-Agent",
-            "Mozilla/5.0 (compatible; MSIE 9.0; " "Windows NT 6.1; Trident/5.0)",
-        )
+        request.add_header("User-Agent", USER_AGENT)
         request.get_method = lambda: "HEAD"
-        response = urlopen(request, context=ssl_unverified_context)
+        response = urlopen(request, timeout=timeout, context=get_ssl_unverified_context())
         # print response.info()
-        return response.getcode()
+        return response.getcode(), response.geturl()
     except HTTPError as e:
-        return e.code
+        return e.code, e.geturl()
     except URLError as e:
-        return e.reason
+        return e.reason, None
     except Exception as e:
         print(e, url)
-        return None
+        return None, None
 
 
-def check_refs(refs, verbose=True, max_threads=MAX_THREADS_DEFAULT):
-    """ Check if urls exist """
-    codes = defaultdict(list)
+def get_status_code(url, timeout=TIMEOUT_DEFAULT):
+    """ Perform HEAD request and return status code """
+    return get_status(url, timeout)[0]
+
+
+def check_refs(
+    refs,
+    verbose=True,
+    max_threads=MAX_THREADS_DEFAULT,
+    engine=None,
+    link_cache=None,
+    **client_options
+):
+    """
+    Check if urls exist, and print a summary. The `engine` defaults to
+    `get_default_engine()`. With the "async" engine,
+    `client_options` are passed on to `aiodownloader.AsyncHTTPClient`
+    (eg. `max_connections`, `max_per_host` and `rate_limit`). Results of
+    a `linkcache.LinkCache` are used instead of checking urls again, and
+    new results are stored in it.
+    """
 
-    def check_url(ref):
-        url = ref.ref
-        status_code = str(get_status_code(url))
-        codes[status_code].append(ref)
+    def print_status(ref, status_code):
         if verbose:
             if status_code == "200":
-                colorprint(OKGREEN, "%s - %s" % (status_code, url))
+                colorprint(OKGREEN, "%s - %s" % (status_code, ref.ref))
             else:
-                colorprint(FAIL, "%s - %s" % (status_code, url))
+                colorprint(FAIL, "%s - %s" % (status_code, ref.ref))
 
-    # Start a threadpool and add the check-url tasks
-    try:
-        pool = ThreadPool(5)
-        pool.map(check_url, refs)
-        pool.wait_completion()
+    def checked(ref, status_code, final_url):
+        if link_cache is not None:
+            link_cache.put(ref.ref, status_code, final_url)
+        print_status(ref, status_code)
+
+    cached = defaultdict(list)
+    if link_cache is not None:
+        cached, refs = link_cache.lookup_refs(refs)
+        for c in cached:
+            for ref in cached[c]:
+                print_status(ref, c)
+
+    if not refs:
+        codes = defaultdict(list)
+    elif (engine or get_default_engine()) == "async":
+        from .aiodownloader import check_refs_async, run
+
+        try:
+            codes = run(check_refs_async(refs, callback=checked, **client_options))
+        except KeyboardInterrupt:
+            return
+    else:
+        timeout = client_options.get("timeout", TIMEOUT_DEFAULT)
+        codes = check_refs_threaded(refs, checked, max_threads, timeout)
+
+    for c in cached:
+        codes[c].extend(cached[c])
+
+    print_summary(codes)
 
-    except Exception as e:
-        print(e)
-    except KeyboardInterrupt:
-        pass
 
-    # Print summary
+def print_summary(codes):
+    """ Print a summary of the link checker results (`status -> [ref, ...]`) """
     print("\nSummary of link checker:")
     if "200" in codes:
         colorprint(OKGREEN, "%s working" % len(codes["200"]))
@@ -97,10 +177,123 @@ def check_refs(refs, verbose=True, max_threads=MAX_THREADS_DEFAULT):
                 print(o)
 
 
+def check_refs_threaded(refs, callback, max_threads=MAX_THREADS_DEFAULT, timeout=TIMEOUT_DEFAULT):
+    """
+    Check urls with a thread pool. Returns a dict of `status -> [ref, ...]`.
+    `callback(ref, status, final_url)` is called for each finished check.
+    A check taking longer than `timeout` seconds is reported as "timed out".
+    """
+    codes = defaultdict(list)
+    refs = interleave_by_host(refs, lambda ref: ref.ref)
+    try:
+        with BoundedExecutor(max_threads) as executor:
+            results = executor.map(
+                lambda ref: get_status(ref.ref, timeout), refs, task_timeout=timeout
+            )
+            for ref, result, error in results:
+                if isinstance(error, TaskTimeoutError):
+                    result = ("timed out", None)
+                elif error is not None:
+                    result = (error, None)
+                status_code, final_url = result
+                status_code = str(status_code)
+                codes[status_code].append(ref)
+                callback(ref, status_code, final_url)
+    except KeyboardInterrupt:
+        pass
+    return codes
+
+
+def format_size(num_bytes):
+    """ Human readable size, eg. `1.5 MB` """
+    if num_bytes < 1024:
+        return "%d bytes" % num_bytes
+    for unit in ["KB", "MB", "GB"]:
+        num_bytes /= 1024.0
+        if num_bytes < 1024 or unit == "GB":
+            return "%.1f %s" % (num_bytes, unit)
+
+
+def download_url(url, output_directory, http_cache=None, timeout=TIMEOUT_DEFAULT):
+    """
+    Download an url into the output directory with a single request. The
+    body is streamed in chunks into a temporary file, which is renamed to
+    the target filename once complete. Returns the filename, or None if the
+    download failed.
+    """
+    fn = url.split("/")[-1].split("?")[0]
+    fn_download = os.path.join(output_directory, fn)
+    fd, fn_tmp = tempfile.mkstemp(prefix=".%s." % fn, suffix=".part", dir=output_directory)
+    os.close(fd)
+    try:
+        request = Request(sanitize_url(url))
+        request.add_header("User-Agent", USER_AGENT)
+        if http_cache is not None:
+            for header, value in http_cache.get_conditional_headers(url).items():
+                request.add_header(header, value)
+
+        response = urlopen(request, timeout=timeout, context=get_ssl_unverified_context())
+        status_code = response.getcode()
+        if status_code != 200:
+            colorprint(FAIL, "Error downloading '%s' (%s)" % (url, status_code))
+            return None
+
+        time_start = time.time()
+        size = 0
+        with open(fn_tmp, "wb") as f:
+            while True:
+                chunk = response.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+                size += len(chunk)
+        elapsed = max(time.time() - time_start, 1e-6)
+
+        if http_cache is not None and http_cache.is_cacheable(response.info()):
+            fn_cache = http_cache.get_tempfile(url)
+            shutil.copyfile(fn_tmp, fn_cache)
+            http_cache.put(url, response.info(), fn_cache)
+
+        os.replace(fn_tmp, fn_download)
+        colorprint(
+            OKGREEN,
+            "Downloaded '%s' to '%s' (%s, %s/s)"
+            % (url, fn_download, format_size(size), format_size(size / elapsed)),
+        )
+        return fn_download
+
+    except HTTPError as e:
+        if e.code == 304 and http_cache is not None:
+            shutil.copyfile(http_cache.get_filename(url), fn_tmp)
+            os.replace(fn_tmp, fn_download)
+            colorprint(OKGREEN, "Not modified '%s', copied to '%s'" % (url, fn_download))
+            return fn_download
+        colorprint(FAIL, "Error downloading '%s' (%s)" % (url, e.code))
+    except URLError as e:
+        colorprint(FAIL, "Error downloading '%s' (%s)" % (url, e.reason))
+    except Exception as e:
+        colorprint(FAIL, "Error downloading '%s' (%s)" % (url, str(e)))
+    finally:
+        if os.path.exists(fn_tmp):
+            os.remove(fn_tmp)
+    return None
+
+
 def download_urls(
-    urls, output_directory, verbose=True, max_threads=MAX_THREADS_DEFAULT
+    urls,
+    output_directory,
+    verbose=True,
+    max_threads=MAX_THREADS_DEFAULT,
+    http_cache=None,
+    engine=None,
+    **client_options
 ):
-    """ Download urls to a target directory """
+    """
+    Download urls to a target directory. With an `HTTPCache`, cached copies
+    are revalidated with conditional requests instead of downloaded again.
+    The `engine` defaults to `get_default_engine()`. With the "async"
+    engine, `client_options` are passed on to `aiodownloader.AsyncHTTPClient`.
+    """
     assert type(urls) in [list, tuple, set], "Urls must be some kind of list"
     assert len(urls), "Need urls"
     assert output_directory, "Need an output_directory"
@@ -109,42 +302,27 @@ def download_urls(
         if verbose:
             print(s)
 
-    def download_url(url):
-        try:
-            fn = url.split("/")[-1].split("?")[0]
-            fn_download = os.path.join(output_directory, fn)
-            with open(fn_download, "wb") as f:
-                request = Request(sanitize_url(url))
-                request.add_header(
-                    "User-Agent",
-                    "Mozilla/5.0 (compatible; "
-                    "MSIE 9.0; Windows NT 6.1; Trident/5.0)",
-                )
-                response = urlopen(request, context=ssl_unverified_context)
-                status_code = response.getcode()
-                if status_code == 200:
-                    f.write(urlopen(request).read())
-                    colorprint(OKGREEN, "Downloaded '%s' to '%s'" % (url, fn_download))
-                else:
-                    colorprint(FAIL, "Error downloading '%s' (%s)" % (url, status_code))
-        except HTTPError as e:
-            colorprint(FAIL, "Error downloading '%s' (%s)" % (url, e.code))
-        except URLError as e:
-            colorprint(FAIL, "Error downloading '%s' (%s)" % (url, e.reason))
-        except Exception as e:
-            colorprint(FAIL, "Error downloading '%s' (%s)" % (url, str(e)))
-
     # Create directory
     if not os.path.exists(output_directory):
         os.makedirs(output_directory)
         vprint("Created directory '%s'" % output_directory)
 
-    try:
-        pool = ThreadPool(5)
-        pool.map(download_url, urls)
-        pool.wait_completion()
+    if (engine or get_default_engine()) == "async":
+        from .aiodownloader import download_urls_async, run
 
-    except Exception as e:
-        print(e)
+        try:
+            run(download_urls_async(urls, output_directory, http_cache, **client_options))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    timeout = client_options.get("timeout", TIMEOUT_DEFAULT)
+    try:
+        with BoundedExecutor(max_threads) as executor:
+            for _ in executor.map(
+                lambda url: download_url(url, output_directory, http_cache, timeout),
+                interleave_by_host(urls),
+            ):
+                pass
     except KeyboardInterrupt:
         pass
@@ -23,3 +23,17 @@ class PDFExtractionError(Exception):
     """
     Raised if PDF content be decoded but content could not be read
     """
+
+
+class BudgetExceededError(PDFExtractionError):
+    """
+    Raised if the extraction exceeds a budget: `budget` is its name
+    (`timeout`, `max_text_bytes` or `max_memory`)
+    """
+
+    def __init__(self, budget):
+        PDFExtractionError.__init__(self, budget)
+        self.budget = budget
+
+    def __str__(self):
+        return "Exceeded %s" % self.budget
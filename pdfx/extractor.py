@@ -10,6 +10,7 @@ Web url matching:
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import re
+from collections import namedtuple
 
 # arXiv.org
 ARXIV_REGEX = r"""arxiv:\s?([^\s,]+)"""
@@ -22,19 +23,153 @@ DOI_REGEX = r"""DOI:\s?([^\s,]+)"""
 URL_REGEX = r"""(?i)\b((?:https?:(?:/{1,3}|[a-z0-9%])|[a-z0-9.\-]+[.](?:com|net|org|edu|gov|mil|aero|asia|biz|cat|coop|info|int|jobs|mobi|museum|name|post|pro|tel|travel|xxx|ac|ad|ae|af|ag|ai|al|am|an|ao|aq|ar|as|at|au|aw|ax|az|ba|bb|bd|be|bf|bg|bh|bi|bj|bm|bn|bo|br|bs|bt|bv|bw|by|bz|ca|cc|cd|cf|cg|ch|ci|ck|cl|cm|cn|co|cr|cs|cu|cv|cx|cy|cz|dd|de|dj|dk|dm|do|dz|ec|ee|eg|eh|er|es|et|eu|fi|fj|fk|fm|fo|fr|ga|gb|gd|ge|gf|gg|gh|gi|gl|gm|gn|gp|gq|gr|gs|gt|gu|gw|gy|hk|hm|hn|hr|ht|hu|id|ie|il|im|in|io|iq|ir|is|it|je|jm|jo|jp|ke|kg|kh|ki|km|kn|kp|kr|kw|ky|kz|la|lb|lc|li|lk|lr|ls|lt|lu|lv|ly|ma|mc|md|me|mg|mh|mk|ml|mm|mn|mo|mp|mq|mr|ms|mt|mu|mv|mw|mx|my|mz|na|nc|ne|nf|ng|ni|nl|no|np|nr|nu|nz|om|pa|pe|pf|pg|ph|pk|pl|pm|pn|pr|ps|pt|pw|py|qa|re|ro|rs|ru|rw|sa|sb|sc|sd|se|sg|sh|si|sj|Ja|sk|sl|sm|sn|so|sr|ss|st|su|sv|sx|sy|sz|tc|td|tf|tg|th|tj|tk|tl|tm|tn|to|tp|tr|tt|tv|tw|tz|ua|ug|uk|us|uy|uz|va|vc|ve|vg|vi|vn|vu|wf|ws|ye|yt|yu|za|zm|zw)/)(?:[^\s()<>{}\[\]]+|\([^\s()]*?\([^\s()]+\)[^\s()]*?\)|\([^\s]+?\))+(?:\([^\s()]*?\([^\s()]+\)[^\s()]*?\)|\([^\s]+?\)|[^\s`!()\[\]{};:'".,<>?«»“”‘’])|(?:(?<!@)[a-z0-9]+(?:[.\-][a-z0-9]+)*[.](?:com|net|org|edu|gov|mil|aero|asia|biz|cat|coop|info|int|jobs|mobi|museum|name|post|pro|tel|travel|xxx|ac|ad|ae|af|ag|ai|al|am|an|ao|aq|ar|as|at|au|aw|ax|az|ba|bb|bd|be|bf|bg|bh|bi|bj|bm|bn|bo|br|bs|bt|bv|bw|by|bz|ca|cc|cd|cf|cg|ch|ci|ck|cl|cm|cn|co|cr|cs|cu|cv|cx|cy|cz|dd|de|dj|dk|dm|do|dz|ec|ee|eg|eh|er|es|et|eu|fi|fj|fk|fm|fo|fr|ga|gb|gd|ge|gf|gg|gh|gi|gl|gm|gn|gp|gq|gr|gs|gt|gu|gw|gy|hk|hm|hn|hr|ht|hu|id|ie|il|im|in|io|iq|ir|is|it|je|jm|jo|jp|ke|kg|kh|ki|km|kn|kp|kr|kw|ky|kz|la|lb|lc|li|lk|lr|ls|lt|lu|lv|ly|ma|mc|md|me|mg|mh|mk|ml|mm|mn|mo|mp|mq|mr|ms|mt|mu|mv|mw|mx|my|mz|na|nc|ne|nf|ng|ni|nl|no|np|nr|nu|nz|om|pa|pe|pf|pg|ph|pk|pl|pm|pn|pr|ps|pt|pw|py|qa|re|ro|rs|ru|rw|sa|sb|sc|sd|se|sg|sh|si|sj|Ja|sk|sl|sm|sn|so|sr|ss|st|su|sv|sx|sy|sz|tc|td|tf|tg|th|tj|tk|tl|tm|tn|to|tp|tr|tt|tv|tw|tz|ua|ug|uk|us|uy|uz|va|vc|ve|vg|vi|vn|vu|wf|ws|ye|yt|yu|za|zm|zw)\b/?(?!@)))"""  # noqa: E501
 
 
+# All reference kinds in one pattern, so that a text is scanned only once.
+# At each position the first matching alternative wins (arxiv and doi
+# before urls). The named group holds the reference itself.
+ID_REGEX = (
+    r"""arxiv(?::\s?(?P<arxiv>[^\s,]+)|.org/abs/(?P<arxiv2>[^\s,]+))"""
+    r"""|DOI:\s?(?P<doi>[^\s,]+)"""
+)
+URL_NAMED_REGEX = URL_REGEX.replace("(?i)", "").replace(r"\b(", r"\b(?P<url>", 1)
+REFERENCE_REGEX = ID_REGEX + "|" + URL_NAMED_REGEX
+
+# Prefilter for URL_REGEX: urls never contain whitespace, and always contain
+# "http:", "https:" or a dot followed by a tld. So the full pattern only has
+# to run on the whitespace-delimited tokens which contain such an anchor.
+URL_ANCHOR_REGEX = r"""https?:|[.][a-z]"""
+TOKEN_REGEX = r"""\S*"""
+
+
+class LazyPattern(object):
+    """
+    A regex which is compiled on first use (compiling the url regexes takes
+    longer than importing pdfx otherwise). Attributes of the compiled
+    pattern (`search`, `finditer`, ...) are cached on the instance.
+    """
+
+    def __init__(self, regex, flags=0):
+        self._regex = regex
+        self._flags = flags
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        value = getattr(re.compile(self._regex, self._flags), name)
+        setattr(self, name, value)
+        return value
+
+
+ARXIV_PATTERN = LazyPattern(ARXIV_REGEX, re.IGNORECASE)
+ARXIV_PATTERN2 = LazyPattern(ARXIV_REGEX2, re.IGNORECASE)
+DOI_PATTERN = LazyPattern(DOI_REGEX, re.IGNORECASE)
+ID_PATTERN = LazyPattern(ID_REGEX, re.IGNORECASE)
+URL_PATTERN = LazyPattern(URL_NAMED_REGEX, re.IGNORECASE)
+REFERENCE_PATTERN = LazyPattern(REFERENCE_REGEX, re.IGNORECASE)
+URL_ANCHOR_PATTERN = LazyPattern(URL_ANCHOR_REGEX, re.IGNORECASE)
+TOKEN_PATTERN = LazyPattern(TOKEN_REGEX)
+
+REFTYPES = {"arxiv": "arxiv", "arxiv2": "arxiv", "doi": "doi", "url": "url"}
+
+# A reference found in a text. `start` and `end` are the offsets of `ref`.
+Match = namedtuple("Match", ["reftype", "ref", "start", "end"])
+
+
+def make_match(m):
+    """ Returns the `Match` of a regex match of REFERENCE_PATTERN, or None """
+    group = m.lastgroup
+    reftype = REFTYPES[group]
+    ref = m.group(group)
+    start = m.start(group)
+    if reftype != "url":
+        # Strip dots (eg. at the end of a sentence) like extract_arxiv/doi
+        stripped = ref.lstrip(".")
+        start += len(ref) - len(stripped)
+        ref = stripped.rstrip(".")
+        if ref.lower().startswith(("http:", "https:")):
+            # eg. "DOI: http://dx.doi.org/..."
+            reftype = "url"
+    if ref:
+        return Match(reftype, ref, start, start + len(ref))
+
+
+def search_url(text, pos=0):
+    """
+    Returns the first regex match of URL_PATTERN in text at or after `pos`
+    (same as `URL_PATTERN.search(text, pos)`), or None. Only the rest of the
+    token at `pos` and the candidate tokens of the prefilter are searched.
+    """
+    end = TOKEN_PATTERN.match(text, pos).end()
+    if end > pos:
+        m = URL_PATTERN.search(text, pos, end)
+        if m:
+            return m
+
+    # The pattern cannot look beyond a token, except for `\b`, lookbehind
+    # and lookahead, which see the same (non-word) whitespace either way
+    anchor = URL_ANCHOR_PATTERN.search(text, end)
+    while anchor:
+        start = anchor.start()
+        while start > end and not text[start - 1].isspace():
+            start -= 1
+        end = TOKEN_PATTERN.match(text, anchor.end()).end()
+        m = URL_PATTERN.search(text, start, end)
+        if m:
+            return m
+        anchor = URL_ANCHOR_PATTERN.search(text, end)
+    return None
+
+
+def iter_urls(text):
+    """ Yields the regex matches of URL_PATTERN (same as `URL_PATTERN.finditer`) """
+    m = search_url(text)
+    while m:
+        yield m
+        m = search_url(text, m.end())
+
+
+def extract_references(text):
+    """
+    Finds all url, arxiv and doi references in a single scan of the text,
+    and yields a `Match` for each (in the order of the text). Same result
+    as `REFERENCE_PATTERN.finditer`: the arxiv and doi ids are searched
+    with their own pattern, and urls with the prefilter of `search_url`.
+    """
+    m_id = ID_PATTERN.search(text)
+    m_url = search_url(text)
+    while m_id or m_url:
+        if m_url is None or (m_id is not None and m_id.start() <= m_url.start()):
+            m = m_id
+        else:
+            m = m_url
+        match = make_match(m)
+        if match:
+            yield match
+
+        # Search again if the other match overlaps with this one
+        pos = m.end()
+        if m_id is not None and m_id.start() < pos:
+            m_id = ID_PATTERN.search(text, pos)
+        if m_url is not None and m_url.start() < pos:
+            m_url = search_url(text, pos)
+
+
+def find_id(text):
+    """ Returns the `Match` of the first arxiv or doi id in text (eg. an url), or None """
+    m = ID_PATTERN.search(text)
+    return make_match(m) if m else None
+
+
 def extract_urls(text):
-    return set(re.findall(URL_REGEX, text, re.IGNORECASE))
+    return set(m.group("url") for m in iter_urls(text))
 
 
 def extract_arxiv(text):
-    res = re.findall(ARXIV_REGEX, text, re.IGNORECASE) + re.findall(
-        ARXIV_REGEX2, text, re.IGNORECASE
-    )
+    res = ARXIV_PATTERN.findall(text) + ARXIV_PATTERN2.findall(text)
     return set([r.strip(".") for r in res])
 
 
 def extract_doi(text):
-    res = set(re.findall(DOI_REGEX, text, re.IGNORECASE))
+    res = set(DOI_PATTERN.findall(text))
     return set([r.strip(".") for r in res])
 
 
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Local HTTP cache for remote PDFs.
+
+Downloaded documents are stored together with their `ETag` and
+`Last-Modified` headers. Further requests for the same url are sent as
+conditional requests (`If-None-Match` / `If-Modified-Since`), and a
+`304 Not Modified` response is served from the local copy.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import json
+import codecs
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPCache(object):
+    """
+    Stores the bodies of HTTP responses in `cache_dir`
+
+    >>> cache = HTTPCache("/tmp/pdfx-http-cache")
+    >>> for header, value in cache.get_conditional_headers(url).items():
+    ...     request.add_header(header, value)
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def get_key(self, url):
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def get_filename(self, url):
+        """ Filename of the cached body of `url` (may not exist) """
+        return os.path.join(self.cache_dir, "%s.body" % self.get_key(url))
+
+    def get_meta_filename(self, url):
+        return os.path.join(self.cache_dir, "%s.json" % self.get_key(url))
+
+    def get_tempfile(self, url):
+        """ Filename to download the body to, before it is stored with `put` """
+        return "%s.%s.tmp" % (self.get_filename(url), os.getpid())
+
+    def get_conditional_headers(self, url):
+        """ Returns the headers to revalidate the cached copy of `url` """
+        if not os.path.isfile(self.get_filename(url)):
+            return {}
+
+        try:
+            with codecs.open(self.get_meta_filename(url), "r", "utf-8") as f:
+                meta = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def is_cacheable(self, headers):
+        """ Only responses which can be revalidated are worth storing """
+        return bool(headers.get("ETag") or headers.get("Last-Modified"))
+
+    def put(self, url, headers, fn_body):
+        """
+        Stores the body in `fn_body` (which is moved into the cache) with
+        the validators from the response `headers`
+        """
+        os.replace(fn_body, self.get_filename(url))
+
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+        }
+        fn_meta = self.get_meta_filename(url)
+        fn_tmp = "%s.%s.tmp" % (fn_meta, os.getpid())
+        with codecs.open(fn_tmp, "w", "utf-8") as f:
+            json.dump(meta, f)
+        os.replace(fn_tmp, fn_meta)
+        logger.debug("Stored '%s' in the http cache" % url)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent cache of link checker results.
+
+Stores the status code, the final url (after redirects) and the time of
+each checked url in a SQLite database, so that urls shared by many
+documents are not checked again on every run. Successful results and
+failures expire after separate TTLs.
+
+>>> cache = LinkCache("links.sqlite", ttl_success=7 * 86400, ttl_failure=3600)
+>>> cache.put("https://doi.org/10.1000/1", "200", "https://example.com/1")
+>>> cache.get("https://doi.org/10.1000/1")
+('200', 'https://example.com/1')
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import time
+import logging
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+TTL_SUCCESS_DEFAULT = 7 * 24 * 3600
+TTL_FAILURE_DEFAULT = 3600
+
+
+def is_success(status):
+    """ Whether a status (code or error, as string) is a successful check """
+    status = str(status)
+    return status.isdigit() and int(status) < 400
+
+
+class LinkCache(object):
+    """ SQLite cache of `url -> (status, final url)`. Can be used from several threads. """
+
+    def __init__(self, path, ttl_success=TTL_SUCCESS_DEFAULT, ttl_failure=TTL_FAILURE_DEFAULT):
+        # Imported here, so that the cli can import the defaults without sqlite3
+        import sqlite3
+
+        self.path = path
+        self.ttl_success = ttl_success
+        self.ttl_failure = ttl_failure
+
+        dirname = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS links "
+            "(url TEXT PRIMARY KEY, status TEXT, final_url TEXT, checked REAL)"
+        )
+        self.db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def get_ttl(self, status):
+        return self.ttl_success if is_success(status) else self.ttl_failure
+
+    def get(self, url):
+        """ Returns `(status, final_url)` of `url`, or None if not cached or expired """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT status, final_url, checked FROM links WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        status, final_url, checked = row
+        if time.time() - checked > self.get_ttl(status):
+            logger.debug("Link cache expired for '%s'" % url)
+            return None
+        return status, final_url
+
+    def put(self, url, status, final_url=None):
+        """ Stores the result of checking `url` """
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO links VALUES (?, ?, ?, ?)",
+                (url, str(status), final_url, time.time()),
+            )
+            self.db.commit()
+
+    def lookup_refs(self, refs):
+        """
+        Looks up the urls of references. Returns a dict of cached
+        `status -> [ref, ...]` and a list of the refs to check.
+        """
+        codes = defaultdict(list)
+        unchecked = []
+        for ref in refs:
+            result = self.get(ref.ref)
+            if result is None:
+                unchecked.append(ref)
+            else:
+                codes[result[0]].append(ref)
+        return codes, unchecked
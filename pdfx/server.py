@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""
+Extraction server: a local HTTP API backed by a pool of pre-warmed worker
+processes, so that clients don't pay the interpreter and import start-up
+for every PDF (Python 3 only).
+
+    $ pdfx serve --port 8123 --workers 4
+    $ curl --data-binary @paper.pdf http://127.0.0.1:8123/extract
+    $ curl -d '{"path": "/data/paper.pdf"}' http://127.0.0.1:8123/extract
+
+- `POST /extract`: the body is either the PDF, or a JSON object with the
+  `path` (filename or URL) of a PDF. Returns the same JSON as `pdfx -j`.
+- `GET /health`: number of workers and pending requests
+
+Requests beyond the workers wait in a queue of `max_queue` requests; when
+it is full the server answers 503. A request which is not finished after
+`timeout` seconds (from its arrival) is answered with 504. If it is still
+queued it is cancelled, else its worker stops interpreting the pages at
+that time (the `timeout` budget of `PDFx`). If a worker dies
+(eg. killed for its memory), its requests are answered with 500 and the
+workers are restarted.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sys
+import json
+import time
+import stat
+import socket
+import logging
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn, TCPServer
+
+import pdfx
+from pdfx import exceptions
+
+logger = logging.getLogger(__name__)
+
+PORT_DEFAULT = 8123
+MAX_QUEUE_DEFAULT = 100
+TIMEOUT_DEFAULT = 60
+
+# Maximum size of an uploaded PDF, and of a JSON request, in bytes
+MAX_UPLOAD_SIZE = 512 * 1024 * 1024
+MAX_JSON_SIZE = 64 * 1024
+
+CHUNK_SIZE = 64 * 1024
+
+INVALID_REQUEST = "Expected a PDF or {\"path\": ...}"
+
+# HTTP status codes of the errors of `extract`
+ERROR_STATUS = {
+    exceptions.FileNotFoundError: 404,
+    exceptions.DownloadError: 502,
+    exceptions.PDFInvalidError: 422,
+}
+
+
+def warm_up():
+    """ First task of the workers: import pdfminer and compile the regexes """
+    from pdfx import backends, extractor
+
+    for pattern in (extractor.ID_PATTERN, extractor.URL_PATTERN, extractor.URL_ANCHOR_PATTERN):
+        pattern.search("")
+    logger.debug("Worker %s ready (%s)" % (os.getpid(), backends.__name__))
+
+
+def extract(uri, options, deadline=None):
+    """
+    Runs in a worker: returns the summary of a PDF (same as `pdfx -j`). The
+    pages are interpreted until `deadline` (a `time.time()`, so the time the
+    request waited in the queue counts too).
+    """
+    if deadline is not None:
+        options = dict(options, timeout=deadline - time.time())
+        if options["timeout"] <= 0:
+            raise exceptions.BudgetExceededError("timeout")
+    return pdfx.PDFx(uri, **options).summary
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/health":
+            return self.send_json(404, {"error": "Not found"})
+        self.send_json(200, self.server.get_health())
+
+    def do_POST(self):
+        deadline = time.time() + self.server.timeout
+        length = int(self.headers.get("Content-Length") or 0)
+        if self.path.split("?")[0] != "/extract":
+            self.close_connection = True
+            return self.send_json(404, {"error": "Not found"})
+        if not length:
+            return self.send_json(400, {"error": "Empty request"})
+        if length > MAX_UPLOAD_SIZE:
+            self.close_connection = True
+            return self.send_json(413, {"error": "PDF larger than %s bytes" % MAX_UPLOAD_SIZE})
+
+        # Reject requests beyond the queue before reading their body
+        if not self.server.acquire():
+            self.close_connection = True
+            return self.send_json(503, {"error": "Too many requests"})
+        try:
+            uri, upload = self.read_request(length)
+        except ValueError as e:
+            self.server.release()
+            return self.send_json(400, {"error": str(e)})
+        except BaseException:
+            self.server.release()
+            raise
+
+        status, result = self.server.extract(uri, deadline, upload)
+        if status == 200 and upload:
+            result["source"] = {"type": "upload", "location": None, "filename": None}
+        self.send_json(status, result)
+
+    def read_request(self, length):
+        """
+        Reads the body: a PDF is streamed to a temporary file, else the `path`
+        of the JSON object is read. Returns the uri and whether it is an upload.
+        """
+        head = self.rfile.read(min(length, len(b"%PDF")))
+        if head == b"%PDF":
+            return self.server.save_upload(self.rfile, length, head), True
+        if length > MAX_JSON_SIZE:
+            self.close_connection = True
+            raise ValueError(INVALID_REQUEST)
+        body = head + self.rfile.read(length - len(head))
+        try:
+            return json.loads(body.decode("utf-8"))["path"], False
+        except (ValueError, KeyError, TypeError):
+            raise ValueError(INVALID_REQUEST)
+
+    def send_json(self, status, obj):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix sockets have no client address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s" % (self.address_string(), format % args))
+
+
+class ExtractionServer(ThreadingMixIn, HTTPServer):
+    """
+    HTTP server which extracts PDFs with `workers` processes (default: number
+    of CPUs). `options` are passed on to `pdfx.PDFx`.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        workers=None,
+        max_queue=MAX_QUEUE_DEFAULT,
+        timeout=TIMEOUT_DEFAULT,
+        **options
+    ):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.options = options
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.executor = self.create_executor()
+        HTTPServer.__init__(self, address, RequestHandler)
+
+    def create_executor(self):
+        """ Starts the worker processes, and warms them up """
+        executor = ProcessPoolExecutor(self.workers)
+        for _ in range(self.workers):
+            executor.submit(warm_up)
+        return executor
+
+    def server_close(self):
+        HTTPServer.server_close(self)
+        # Don't wait for running extractions. The processes of the executor are
+        # not part of its public API, so they only finish their tasks otherwise.
+        processes = list((getattr(self.executor, "_processes", None) or {}).values())
+        self.executor.shutdown(wait=False)
+        for process in processes:
+            process.terminate()
+
+    def get_health(self):
+        return {"status": "ok", "workers": self.workers, "pending": self.pending}
+
+    def acquire(self):
+        """ Takes a request slot, or returns False if the queue is full """
+        with self.lock:
+            if self.pending >= self.workers + self.max_queue:
+                return False
+            self.pending += 1
+            return True
+
+    def release(self, upload=None):
+        """ Frees a request slot, and removes its upload """
+        if upload is not None:
+            os.remove(upload)
+        with self.lock:
+            self.pending -= 1
+
+    def save_upload(self, stream, length, head=b""):
+        """
+        Streams an uploaded PDF of `length` bytes (starting with `head`) in
+        chunks to a temporary file for the workers
+        """
+        fd, fn = tempfile.mkstemp(prefix="pdfx-", suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(head)
+                remaining = length - len(head)
+                while remaining > 0:
+                    chunk = stream.read(min(remaining, CHUNK_SIZE))
+                    if not chunk:
+                        raise IOError("Incomplete upload")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+        except BaseException:
+            os.remove(fn)
+            raise
+        return fn
+
+    def extract(self, uri, deadline, upload=False):
+        """
+        Extracts a PDF in a worker with a request slot from `acquire`, and
+        returns the HTTP status and the summary (or error), or 504 at the
+        `deadline` (a `time.time()`). The slot is released and the upload
+        removed when the worker is done.
+        """
+
+        def done(_):
+            self.release(uri if upload else None)
+
+        future = self.submit(uri, deadline)
+        try:
+            return 200, future.result(max(0, deadline - time.time()))
+        except TimeoutError:
+            # Don't start it if it is still queued (the worker stops at the deadline)
+            future.cancel()
+            return 504, {"error": "Timed out after %s seconds" % self.timeout}
+        except BrokenProcessPool:
+            logger.warning("A worker died while processing '%s'" % uri)
+            return 500, {"error": "The worker processing the PDF died"}
+        except Exception as e:
+            logger.debug("Error processing '%s': %s" % (uri, e))
+            status = ERROR_STATUS.get(type(e), 500)
+            return status, {"error": "%s: %s" % (type(e).__name__, e)}
+        finally:
+            # The request slot is only free when the worker is: now if the
+            # future is done (also if a worker died or it was cancelled), else
+            # when the worker stops at the deadline
+            future.add_done_callback(done)
+
+    def submit(self, uri, deadline):
+        """ Submits the extraction of a PDF, restarting the workers if one died """
+        with self.lock:
+            try:
+                return self.executor.submit(extract, uri, self.options, deadline)
+            except BrokenProcessPool:
+                logger.warning("Restarting the workers")
+                self.executor.shutdown(wait=False)
+                self.executor = self.create_executor()
+                return self.executor.submit(extract, uri, self.options, deadline)
+
+
+class UnixExtractionServer(ExtractionServer):
+    """ `ExtractionServer` listening on a Unix socket (`address` is its path) """
+
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        # Replace the socket of an earlier server
+        if os.path.exists(self.server_address) and stat.S_ISSOCK(
+            os.stat(self.server_address).st_mode
+        ):
+            os.remove(self.server_address)
+        TCPServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(
+        prog="pdfx serve",
+        description="Serve the extraction of PDFs over HTTP, with a pool of "
+        "pre-warmed worker processes. POST a PDF (or {\"path\": filename or URL}) "
+        "to /extract to get the same JSON as 'pdfx -j'.",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="(default: %(default)s)")
+    parser.add_argument("--port", type=int, default=PORT_DEFAULT, help="(default: %(default)s)")
+    parser.add_argument("--unix-socket", metavar="PATH", help="Listen on a Unix socket instead")
+    parser.add_argument(
+        "--workers",
+        metavar="N",
+        type=int,
+        help="Number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--max-queue",
+        metavar="N",
+        type=int,
+        default=MAX_QUEUE_DEFAULT,
+        help="Requests waiting for a worker before answering 503 (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--timeout",
+        metavar="SECONDS",
+        type=float,
+        default=TIMEOUT_DEFAULT,
+        help="Answer 504 if a PDF is not processed in time (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=["normal", "none"],
+        default="normal",
+        help="Text layout analysis (default: normal)",
+    )
+    parser.add_argument("--cache-dir", metavar="DIRECTORY", help="Cache extraction results")
+    parser.add_argument("--max-download-size", metavar="BYTES", type=int)
+    parser.add_argument("--max-pages", metavar="N", type=int, help="Only interpret N pages")
+    parser.add_argument(
+        "--max-text-bytes",
+        metavar="BYTES",
+        type=int,
+        help="Stop interpreting the pages of a PDF when its text exceeds this size",
+    )
+    parser.add_argument(
+        "--max-memory",
+        metavar="BYTES",
+        type=int,
+        help="Stop interpreting the pages when a worker uses more memory",
+    )
+    return parser
+
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+    # Log the requests, but not the infos of pdfminer
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(message)s")
+    logger.setLevel(logging.INFO)
+
+    options = {
+        "workers": args.workers,
+        "max_queue": args.max_queue,
+        "timeout": args.timeout,
+        "layout": args.layout,
+        "cache": args.cache_dir,
+        "max_download_size": args.max_download_size,
+        "max_pages": args.max_pages,
+        "max_text_bytes": args.max_text_bytes,
+        "max_memory": args.max_memory,
+    }
+    if args.unix_socket:
+        server = UnixExtractionServer(args.unix_socket, **options)
+        location = args.unix_socket
+    else:
+        server = ExtractionServer((args.host, args.port), **options)
+        location = "http://%s:%s" % server.server_address[:2]
+
+    print("Serving on %s with %s workers" % (location, server.workers), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
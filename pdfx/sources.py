@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Opening and copying of PDF sources without duplicating their content in memory.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sys
+import mmap
+import shutil
+import logging
+from io import BytesIO
+from tempfile import SpooledTemporaryFile, NamedTemporaryFile
+
+from .exceptions import DownloadError, PDFInvalidError
+
+IS_PY2 = sys.version_info < (3, 0)
+
+if not IS_PY2:
+    # Python 3
+    unicode = str
+
+logger = logging.getLogger(__name__)
+
+
+# Remote PDFs are kept in memory up to this size, larger ones are spooled to disk
+SPOOL_MAX_MEMORY = 16 * 1024 * 1024
+
+# Seconds to wait for the connection, and for each read from the socket
+TIMEOUT_DEFAULT = (10, 60)
+
+CHUNK_SIZE = 64 * 1024
+
+# The `%PDF` header has to be within the first 1024 bytes
+HEADER_SEARCH_SIZE = 1024
+
+
+def open_file(fn):
+    """
+    Returns a seekable, read-only stream of a local file. The file is
+    memory-mapped, so pages are read by the OS on demand and shared with the
+    page cache instead of being copied into the process.
+    """
+    with open(fn, "rb") as f:
+        try:
+            # The mapping stays valid after the file is closed
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, mmap.error):
+            # Empty files and special files cannot be mapped
+            return BytesIO(f.read())
+
+
+def open_url(
+    url,
+    max_size=None,
+    timeout=TIMEOUT_DEFAULT,
+    max_memory=SPOOL_MAX_MEMORY,
+    http_cache=None,
+):
+    """
+    Downloads a remote PDF in chunks into a `SpooledTemporaryFile` (in memory
+    up to `max_memory` bytes, then on disk), and returns it as seekable stream.
+    - `max_size` is the maximum size in bytes (default: unlimited)
+    - `timeout` is in seconds, either a number or a `(connect, read)` tuple
+    - `http_cache` is an optional `HTTPCache`. A cached copy is revalidated
+      with a conditional request and opened from disk if it is unchanged,
+      and new downloads are stored in the cache.
+
+    Raises `DownloadError` if the download fails or is too large, and
+    `PDFInvalidError` as soon as the first bytes show it is not a PDF.
+    """
+    # urllib is slow to import and only needed for remote PDFs
+    if IS_PY2:
+        from urllib2 import Request, urlopen, HTTPError
+    else:
+        from urllib.request import Request, urlopen, HTTPError
+
+    if isinstance(timeout, (tuple, list)):
+        connect_timeout, read_timeout = timeout
+    else:
+        connect_timeout = read_timeout = timeout
+
+    request = Request(url)
+    if http_cache is not None:
+        for header, value in http_cache.get_conditional_headers(url).items():
+            request.add_header(header, value)
+
+    try:
+        response = urlopen(request, timeout=connect_timeout)
+    except HTTPError as e:
+        if e.code == 304 and http_cache is not None:
+            logger.debug("Not modified, using cached copy of '%s'" % url)
+            return open_file(http_cache.get_filename(url))
+        raise DownloadError("Error downloading '%s' (%s)" % (url, unicode(e)))
+    except Exception as e:
+        raise DownloadError("Error downloading '%s' (%s)" % (url, unicode(e)))
+
+    headers = response.info()
+    if http_cache is not None and http_cache.is_cacheable(headers):
+        fn_cache = http_cache.get_tempfile(url)
+        out = open(fn_cache, "wb")
+    else:
+        fn_cache = None
+        out = SpooledTemporaryFile(max_size=max_memory)
+
+    try:
+        set_read_timeout(response, read_timeout)
+        copy_response(response, out, url, max_size)
+    except Exception as e:
+        out.close()
+        if fn_cache:
+            os.remove(fn_cache)
+        if isinstance(e, (DownloadError, PDFInvalidError)):
+            raise
+        raise DownloadError("Error downloading '%s' (%s)" % (url, unicode(e)))
+    finally:
+        response.close()
+
+    if fn_cache:
+        out.close()
+        http_cache.put(url, headers, fn_cache)
+        return open_file(http_cache.get_filename(url))
+
+    out.seek(0)
+    return out
+
+
+def spool_to_file(stream):
+    """
+    Copies a stream in chunks to a named temporary file, for worker
+    processes which open the PDF by filename. The file is removed when it is
+    closed (or garbage collected).
+    """
+    spool = NamedTemporaryFile(prefix="pdfx-", suffix=".pdf")
+    shutil.copyfileobj(stream, spool, CHUNK_SIZE)
+    spool.flush()
+    return spool
+
+
+def copy_response(response, out, url, max_size=None):
+    """
+    Copies the body of a response in chunks to the file `out`. Raises
+    `DownloadError` if it exceeds `max_size` bytes, and `PDFInvalidError`
+    if there is no PDF header in the first bytes.
+    """
+    length = response.info().get("Content-Length")
+    if max_size and length and length.isdigit() and int(length) > max_size:
+        raise DownloadError(
+            "Error downloading '%s' (size of %s bytes exceeds the maximum of %s)"
+            % (url, length, max_size)
+        )
+
+    size = 0
+    head = b""
+    while True:
+        chunk = response.read(CHUNK_SIZE)
+        if len(head) < HEADER_SEARCH_SIZE:
+            missing = HEADER_SEARCH_SIZE - len(head)
+            head += chunk[:missing]
+            if (not chunk or len(head) == HEADER_SEARCH_SIZE) and b"%PDF" not in head:
+                raise PDFInvalidError("Invalid PDF (no PDF header in '%s')" % url)
+        if not chunk:
+            break
+
+        size += len(chunk)
+        if max_size and size > max_size:
+            raise DownloadError(
+                "Error downloading '%s' (exceeds the maximum size of %s bytes)"
+                % (url, max_size)
+            )
+        out.write(chunk)
+
+
+def set_read_timeout(response, timeout):
+    """
+    Sets the timeout of the socket of an `urlopen` response, which otherwise
+    uses the connect timeout for all reads.
+    """
+    # response.fp is a buffered socket.SocketIO (not part of the public API,
+    # so keep the connect timeout if the internals are different)
+    sock = getattr(getattr(response.fp, "raw", None), "_sock", None)
+    if sock is not None:
+        sock.settimeout(timeout)
+
+
+def copy_file(src, dst):
+    """
+    Copies the file `src` to `dst` without reading it into Python: as hard
+    link if both are on the same filesystem, else with `shutil.copyfile`
+    (which uses `os.sendfile` on Linux and `fcopyfile` on macOS).
+    """
+    if os.path.exists(dst):
+        if os.path.samefile(src, dst):
+            return
+        os.remove(dst)
+
+    try:
+        os.link(src, dst)
+        return
+    except (AttributeError, OSError):
+        # No hard link support, or on different filesystems
+        pass
+
+    shutil.copyfile(src, dst)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Timings and counts of the stages of an extraction, to see where the time
+goes (eg. to route expensive documents to dedicated workers).
+
+>>> stats = Stats(callback=lambda stage, seconds: print(stage, seconds))
+>>> pdf = pdfx.PDFx("paper.pdf", stats=stats)
+>>> pdf.get_references()
+>>> stats.as_dict()
+{'stages': {'parse': 0.15, 'pages.interpret': 1.2, ...}, 'counts': {'pages': 13, ...},
+ 'pages': [{'page': 1, 'seconds': 0.09, 'text_length': 5322, 'annotations': 2}, ...]}
+
+Stages:
+- `download`, `cache`: reading a remote PDF, and looking it up in the cache
+- `parse`: the document structure (trailer, xref tables and catalog)
+- `metadata.info`, `metadata.xmp`, `metadata.page_count`: the metadata
+- `pages.interpret`: the content streams of the pages (with layout analysis)
+- `pages.annotations`: resolving the link annotations of the pages
+- `pages.parallel`: waiting for the worker processes (with `jobs`)
+- `references.regex`, `references.classify`: finding and classifying the
+  references in the text
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Monotonic clock (Python 3.3+)
+clock = getattr(time, "perf_counter", time.time)
+
+
+class Stats(object):
+    """
+    Records the seconds of each stage, counts, and with `pages` the timings
+    of each page. `callback(stage, seconds)` is called for each timing (eg.
+    to send it to a metrics system).
+    """
+
+    def __init__(self, pages=True, callback=None):
+        self.stages = OrderedDict()
+        self.counts = OrderedDict()
+        self.pages = [] if pages else None
+        self.callback = callback
+
+    @contextmanager
+    def timer(self, stage):
+        """ Context manager which adds its duration to `stage` """
+        started = clock()
+        try:
+            yield
+        finally:
+            self.add_time(stage, clock() - started)
+
+    def add_time(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0) + seconds
+        if self.callback is not None:
+            self.callback(stage, seconds)
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def add_page(self, page, seconds, text_length, annotations):
+        """ Records the interpretation of a page (`page` starts at 1) """
+        self.add_time("pages.interpret", seconds)
+        self.count("pages")
+        self.count("text_length", text_length)
+        self.count("annotations", annotations)
+        if self.pages is not None:
+            self.pages.append(
+                OrderedDict(
+                    [
+                        ("page", page),
+                        ("seconds", round(seconds, 6)),
+                        ("text_length", text_length),
+                        ("annotations", annotations),
+                    ]
+                )
+            )
+
+    def as_dict(self):
+        """ Returns the stats as JSON-serializable dict """
+        ret = OrderedDict()
+        ret["stages"] = OrderedDict((k, round(v, 6)) for k, v in self.stages.items())
+        ret["counts"] = OrderedDict(self.counts)
+        if self.pages is not None:
+            ret["pages"] = list(self.pages)
+        return ret
+
+    def __str__(self):
+        lines = ["Stats:"]
+        for stage, seconds in self.stages.items():
+            lines.append("- %s: %.3f s" % (stage, seconds))
+        for name, n in self.counts.items():
+            lines.append("- %s: %s" % (name, n))
+        for page in self.pages or []:
+            lines.append(
+                "- page %(page)s: %(seconds).3f s, %(text_length)s chars, "
+                "%(annotations)s annotations" % page
+            )
+        return "\n".join(lines)
+
+
+@contextmanager
+def timed(stats, stage):
+    """ `stats.timer(stage)`, or nothing if `stats` is None """
+    if stats is None:
+        yield
+    else:
+        with stats.timer(stage):
+            yield
@@ -1,51 +1,169 @@
 """
-Inspired by http://stackoverflow.com/a/7257510
-"""
-
-from threading import Thread
-import sys
-
-IS_PY2 = sys.version_info < (3, 0)
-
-if IS_PY2:
-    # Python 2
-    from Queue import Queue
-else:
-    # Python 3
-    from queue import Queue
-
-
-class Worker(Thread):
-    """ Thread executing tasks from a given tasks queue """
-
-    def __init__(self, tasks):
-        Thread.__init__(self)
-        self.tasks = tasks
-        self.daemon = True
-        self.start()
+Bounded thread pool executor with results, cancellation and deadlines.
 
-    def run(self):
-        while True:
-            func, args, kargs = self.tasks.get()
-            try:
-                func(*args, **kargs)
-            except Exception as e:
-                print(e)
-            finally:
-                self.tasks.task_done()
+>>> with BoundedExecutor(max_threads=5) as executor:
+...     for url, status, error in executor.map(get_status_code, urls, task_timeout=30):
+...         print(url, status if error is None else error)
 
-
-class ThreadPool:
-    """ Pool of threads consuming tasks from a queue """
+Threads cannot be killed: a task that exceeds its deadline is reported as
+`TaskTimeoutError` and abandoned, but its thread only finishes when the
+task returns. Blocking calls in tasks should therefore have their own
+timeouts (eg. the socket timeout of `urlopen`).
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import time
+import logging
+
+# On Python 2 from the `futures` backport
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+# Interval to check the deadlines of tasks which have not started yet
+POLL_INTERVAL = 0.1
+
+
+class TaskTimeoutError(Exception):
+    """ Reported for tasks which exceeded their deadline """
+
+
+class Task(object):
+    """ Calls `func(item)` and remembers when it was started """
+
+    def __init__(self, func, item):
+        self.func = func
+        self.item = item
+        self.started = None
+
+    def __call__(self):
+        self.started = time.time()
+        return self.func(self.item)
+
+
+class BoundedExecutor(object):
+    """
+    Runs tasks in at most `max_threads` threads. The threads are shut down
+    with `shutdown`, or when leaving the `with` block (which does not wait
+    for tasks abandoned by `map` after their deadline).
+    """
+
+    def __init__(self, max_threads):
+        self.executor = ThreadPoolExecutor(max_threads)
+        self.futures = set()
+        self.abandoned = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            # Don't wait for any task after an error or KeyboardInterrupt
+            self.shutdown(wait=False)
+        elif self.abandoned:
+            wait(self.futures - self.abandoned)
+            self.executor.shutdown(wait=False)
+        else:
+            self.shutdown(wait=True)
+
+    def submit(self, func, *args, **kwargs):
+        """ Schedules `func(*args, **kwargs)` and returns a `Future` """
+        future = self.executor.submit(func, *args, **kwargs)
+        self.futures.add(future)
+        future.add_done_callback(self.futures.discard)
+        return future
+
+    def cancel(self):
+        """ Cancels all tasks which have not started yet """
+        for future in list(self.futures):
+            future.cancel()
+
+    def shutdown(self, wait=True):
+        """ Stops the threads, after waiting for all tasks or cancelling the pending ones """
+        if not wait:
+            self.cancel()
+        self.executor.shutdown(wait=wait)
+
+    def map(self, func, items, timeout=None, task_timeout=None):
+        """
+        Runs `func(item)` for all items, and yields `(item, result, error)`
+        in the order the tasks finish. `error` is the exception raised by the
+        task (or a `TaskTimeoutError`), else None.
+
+        - `task_timeout`: seconds a task may run, after it has started
+        - `timeout`: seconds until all tasks have to be finished
+
+        Tasks which have not started when the generator is closed (eg. by an
+        exception or KeyboardInterrupt in the loop) are cancelled.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        pending = {}
+        for item in items:
+            task = Task(func, item)
+            pending[self.submit(task)] = task
+
+        try:
+            while pending:
+                done, _ = wait(
+                    pending,
+                    timeout=self.get_wait_timeout(pending, deadline, task_timeout),
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    task = pending.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        logger.debug("Task for %r failed: %s" % (task.item, error))
+                    yield task.item, None if error else future.result(), error
+
+                for future, task in list(pending.items()):
+                    if self.is_expired(task, deadline, task_timeout):
+                        if not future.cancel():
+                            # Running, its thread is only free when it returns
+                            self.abandoned.add(future)
+                            future.add_done_callback(self.abandoned.discard)
+                        del pending[future]
+                        yield task.item, None, TaskTimeoutError("Timed out")
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def get_wait_timeout(self, pending, deadline, task_timeout):
+        """ Seconds until the next deadline of a pending task, or None """
+        deadlines = [] if deadline is None else [deadline]
+        if task_timeout is not None:
+            for task in pending.values():
+                if task.started is None:
+                    deadlines.append(time.time() + POLL_INTERVAL)
+                    break
+            deadlines.extend(
+                task.started + task_timeout
+                for task in pending.values()
+                if task.started is not None
+            )
+        if not deadlines:
+            return None
+        return max(0, min(deadlines) - time.time())
+
+    def is_expired(self, task, deadline, task_timeout):
+        now = time.time()
+        if deadline is not None and now >= deadline:
+            return True
+        return task_timeout is not None and task.started is not None and (
+            now >= task.started + task_timeout
+        )
+
+
+class ThreadPool(object):
+    """ Pool of threads consuming tasks from a queue (interface of earlier versions) """
 
     def __init__(self, num_threads):
-        self.tasks = Queue(num_threads)
-        for _ in range(num_threads):
-            Worker(self.tasks)
+        self.executor = BoundedExecutor(num_threads)
 
     def add_task(self, func, *args, **kargs):
         """ Add a task to the queue """
-        self.tasks.put((func, args, kargs))
+        future = self.executor.submit(func, *args, **kargs)
+        future.add_done_callback(log_exception)
 
     def map(self, func, args_list):
         """ Add a list of tasks to the queue """
@@ -53,23 +171,10 @@ class ThreadPool:
             self.add_task(func, args)
 
     def wait_completion(self):
-        """ Wait for completion of all the tasks in the queue """
-        self.tasks.join()
-
-
-if __name__ == "__main__":
-    from random import randrange
-    from time import sleep
-
-    delays = [randrange(5, 10) for i in range(100)]
-
-    def wait_delay(d):
-        print("sleeping for (%d)sec" % d)
-        sleep(d)
-
-    pool = ThreadPool(5)
+        """ Wait for completion of all the tasks in the queue, and stop the threads """
+        self.executor.shutdown(wait=True)
 
-    for i, d in enumerate(delays):
-        pool.add_task(wait_delay, d)
 
-    pool.wait_completion()
+def log_exception(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("Task failed: %s" % future.exception())
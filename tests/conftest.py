@@ -0,0 +1,71 @@
+from __future__ import absolute_import, division, print_function
+
+import os
+import time
+import threading
+import pytest
+
+try:
+    from http.server import HTTPServer, SimpleHTTPRequestHandler
+except ImportError:
+    from BaseHTTPServer import HTTPServer
+    from SimpleHTTPServer import SimpleHTTPRequestHandler
+
+curdir = os.path.dirname(os.path.realpath(__file__))
+
+
+class PDFRequestHandler(SimpleHTTPRequestHandler):
+    """ Serves the files in tests/pdfs """
+
+    def send_head(self):
+        if self.path in self.server.throttled:
+            # Answer the first request of a throttled path with 429
+            self.server.throttled.remove(self.path)
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+        return SimpleHTTPRequestHandler.send_head(self)
+
+    def copyfile(self, source, outputfile):
+        if self.path not in self.server.slow:
+            return SimpleHTTPRequestHandler.copyfile(self, source, outputfile)
+        # Slow paths send a chunk every 0.1 seconds
+        while True:
+            chunk = source.read(64 * 1024)
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            outputfile.flush()
+            time.sleep(0.1)
+
+    def translate_path(self, path):
+        return os.path.join(curdir, "pdfs", path.split("?")[0].lstrip("/"))
+
+    def log_request(self, code="-", size="-"):
+        self.server.requests.append((self.path, int(code)))
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    """
+    Local HTTP server for the test PDFs. Yields the server, with the base url
+    in `server.url` and the `(path, status code)` of all requests in
+    `server.requests`. Paths in `server.throttled` are answered with 429
+    once, and the bodies of paths in `server.slow` are sent slowly.
+    """
+    server = HTTPServer(("127.0.0.1", 0), PDFRequestHandler)
+    server.url = "http://127.0.0.1:%s" % server.server_address[1]
+    server.requests = []
+    server.throttled = set()
+    server.slow = set()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,82 @@
+from __future__ import absolute_import, division, print_function
+
+import os
+import time
+from pdfx.backends import Reference
+from pdfx.aiodownloader import (
+    run,
+    check_refs_async,
+    download_urls_async,
+    parse_retry_after,
+    AsyncHTTPClient,
+)
+
+curdir = os.path.dirname(os.path.realpath(__file__))
+
+
+def test_check_refs_async(http_server):
+    fns = ["valid.pdf", "i14doc1.pdf", "x.pdf"]
+    refs = [Reference(http_server.url + "/" + fn) for fn in fns]
+    codes = run(check_refs_async(refs, max_per_host=2))
+    assert sorted(ref.ref for ref in codes["200"]) == sorted(ref.ref for ref in refs[:2])
+    assert codes["404"] == [refs[2]]
+    assert len(http_server.requests) == 3
+
+
+def test_connection_reuse(http_server):
+    writers = []
+    key = ("http", "127.0.0.1", http_server.server_port)
+
+    async def check():
+        async with AsyncHTTPClient(max_per_host=1) as client:
+            for _ in range(3):
+                response = await client.request("HEAD", http_server.url + "/valid.pdf")
+                assert response.status == 200
+                reader, writer = client.pool.idle[key][0]
+                writers.append(writer)
+
+    http_server.RequestHandlerClass.protocol_version = "HTTP/1.1"
+    try:
+        run(check())
+    finally:
+        http_server.RequestHandlerClass.protocol_version = "HTTP/1.0"
+    assert writers[0] is writers[1] is writers[2]
+
+
+def test_download_urls_async(http_server, tmpdir):
+    urls = [http_server.url + "/i14doc1.pdf", http_server.url + "/missing.pdf"]
+    results = run(download_urls_async(urls, str(tmpdir)))
+    assert results == [str(tmpdir.join("i14doc1.pdf")), None]
+    with open(os.path.join(curdir, "pdfs/i14doc1.pdf"), "rb") as f1, open(results[0], "rb") as f2:
+        assert f1.read() == f2.read()
+
+
+def test_slow_download(http_server, tmpdir):
+    # valid.pdf takes about 2 seconds, but data arrives every 0.1 seconds
+    http_server.slow.add("/valid.pdf")
+    t = time.time()
+    results = run(download_urls_async([http_server.url + "/valid.pdf"], str(tmpdir), timeout=1))
+    assert time.time() - t > 1
+    assert results == [str(tmpdir.join("valid.pdf"))]
+    assert os.path.getsize(results[0]) == os.path.getsize(os.path.join(curdir, "pdfs/valid.pdf"))
+
+
+def test_retry_after(http_server):
+    refs = [Reference(http_server.url + "/valid.pdf")]
+    http_server.throttled.add("/valid.pdf")
+    t = time.time()
+    codes = run(check_refs_async(refs))
+    assert time.time() - t >= 1
+    assert codes["200"] == refs
+    assert http_server.requests == [("/valid.pdf", 429), ("/valid.pdf", 200)]
+
+    http_server.throttled.add("/valid.pdf")
+    codes = run(check_refs_async(refs, max_retries=0))
+    assert codes["429"] == refs
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
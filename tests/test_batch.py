@@ -0,0 +1,21 @@
+from __future__ import absolute_import, division, print_function
+
+import os
+from pdfx.batch import find_pdfs, process_batch
+
+curdir = os.path.dirname(os.path.realpath(__file__))
+
+
+def test_batch():
+    pdfs_dir = os.path.join(curdir, "pdfs")
+    uris = list(find_pdfs([pdfs_dir, "-"], stdin=["\n", "other.pdf\n"]))
+    assert len(uris) == 5
+    assert uris[-1] == "other.pdf"
+
+    results = {}
+    for result in process_batch(uris, jobs=2):
+        results[os.path.basename(result["source"]["location"])] = result
+    assert len(results) == 5
+    assert "error" in results["invalid.pdf"]
+    assert "error" in results["other.pdf"]
+    assert len(results["valid.pdf"]["references"]["pdf"]) == 18
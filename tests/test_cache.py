@@ -0,0 +1,138 @@
+from __future__ import absolute_import, division, print_function
+
+import os
+import re
+import pdfx
+from pdfx.cache import ResultCache, find_revision_ends
+
+curdir = os.path.dirname(os.path.realpath(__file__))
+
+
+def test_result_cache(tmpdir):
+    fn = os.path.join(curdir, "pdfs/valid.pdf")
+    pdf = pdfx.PDFx(fn, cache=str(tmpdir))
+    assert len(tmpdir.listdir()) == 1
+
+    pdf_cached = pdfx.PDFx(fn, cache=str(tmpdir))
+    assert isinstance(pdf_cached.reader, pdfx.backends.ResultBackend)
+    assert pdf_cached.get_text() == pdf.get_text()
+    assert pdf_cached.get_metadata() == pdf.get_metadata()
+    assert len(pdf_cached.get_references("pdf")) == 18
+
+    # Different options are cached separately
+    pdfx.PDFx(fn, layout="none", cache=str(tmpdir))
+    assert len(tmpdir.listdir()) == 2
+
+
+def test_result_cache_budgets(tmpdir):
+    fn = os.path.join(curdir, "pdfs/valid.pdf")
+
+    # Truncated by max_pages: cached with its own key
+    pdfx.PDFx(fn, max_pages=2, cache=str(tmpdir))
+    pdf = pdfx.PDFx(fn, max_pages=2, cache=str(tmpdir))
+    assert isinstance(pdf.reader, pdfx.backends.ResultBackend)
+    assert pdf.summary["truncated"] == "max_pages"
+
+    # Truncated by the timeout: not cached
+    pdfx.PDFx(fn, timeout=0.000001, cache=str(tmpdir))
+    assert len(tmpdir.listdir()) == 1
+
+    # Complete results are the same with a timeout
+    pdfx.PDFx(fn, cache=str(tmpdir))
+    pdf = pdfx.PDFx(fn, timeout=60, cache=str(tmpdir))
+    assert isinstance(pdf.reader, pdfx.backends.ResultBackend)
+    assert "truncated" not in pdf.summary
+
+
+def test_result_cache_eviction(tmpdir):
+    cache = ResultCache(str(tmpdir), max_size=250)
+    for i in range(5):
+        cache.put("key%s" % i, {"text": "x" * 100})
+    assert len(tmpdir.listdir()) == 2
+    assert cache.get("key4") == {"text": "x" * 100}
+    assert cache.get("key0") is None
+
+
+def test_result_cache_size(tmpdir, monkeypatch):
+    scans = []
+    listdir = os.listdir
+    monkeypatch.setattr(os, "listdir", lambda path: scans.append(path) or listdir(path))
+
+    # The directory is only scanned on the first put while the cache fits
+    cache = ResultCache(str(tmpdir), max_size=1000)
+    for i in range(5):
+        cache.put("key%s" % i, {"text": "x" * 100})
+    assert len(scans) == 1
+    assert cache.size == sum(f.size() for f in tmpdir.listdir())
+    del scans[:]
+
+    # Replacing a result doesn't count it twice
+    cache.put("key0", {"text": "x" * 100})
+    assert not scans
+
+    # Then once the tracked size exceeds max_size
+    for i in range(5, 10):
+        cache.put("key%s" % i, {"text": "x" * 100})
+    assert scans
+    assert cache.size <= 1000
+
+
+def append_update(data, objid, body):
+    """ Returns `data` with an incremental update which replaces object `objid` """
+    prev = int(re.findall(br"startxref\s+(\d+)", data)[-1])
+    obj = b"\n%d 0 obj\n" % objid + body + b"\nendobj\n"
+    xref = len(data) + len(obj)
+    return (
+        data
+        + obj
+        + b"xref\n0 1\n0000000000 65535 f \n%d 1\n%010d 00000 n \n" % (objid, len(data) + 1)
+        + b"trailer\n<< /Size 568 /Root 452 0 R /Info 450 0 R /Prev %d >>\n" % prev
+        + b"startxref\n%d\n%%%%EOF\n" % xref
+    )
+
+
+def test_incremental_update(tmpdir, monkeypatch):
+    with open(os.path.join(curdir, "pdfs/valid.pdf"), "rb") as f:
+        data = f.read()
+    fn = str(tmpdir.join("doc.pdf"))
+    with open(fn, "wb") as f:
+        f.write(data)
+    cache_dir = str(tmpdir.join("cache"))
+    pdfx.PDFx(fn, cache=cache_dir)
+
+    # New revision: empty content stream (object 7) of page 3
+    with open(fn, "wb") as f:
+        f.write(append_update(data, 7, b"<< /Length 5 >>\nstream\nBT ET\nendstream"))
+    with open(fn, "rb") as f:
+        assert len(data) in find_revision_ends(f)
+
+    interpreted = []
+    process_page = pdfx.backends.PDFPageInterpreter.process_page
+    monkeypatch.setattr(
+        pdfx.backends.PDFPageInterpreter,
+        "process_page",
+        lambda self, page: interpreted.append(page.pageid) or process_page(self, page),
+    )
+    pdf = pdfx.PDFx(fn, cache=cache_dir)
+    assert interpreted == [6]
+
+    # Same result as a full parse
+    pdf_full = pdfx.PDFx(fn)
+    assert pdf.get_text() == pdf_full.get_text()
+    assert pdf.get_metadata() == pdf_full.get_metadata()
+    refs = set((r.ref, r.reftype, r.page, r.offset, r.bbox) for r in pdf.get_references())
+    refs_full = set((r.ref, r.reftype, r.page, r.offset, r.bbox) for r in pdf_full.get_references())
+    assert refs == refs_full
+
+    # A page cut by max_text_bytes is not reused as a complete page, when an
+    # earlier page becomes shorter and more of the text fits into the budget
+    with open(fn, "wb") as f:
+        f.write(data)
+    lengths = [len(page.text.encode("utf-8")) for page in pdfx.PDFx(fn).iter_pages()]
+    max_text_bytes = sum(lengths[:4]) + lengths[4] // 2
+    cache_dir = str(tmpdir.join("cache_budget"))
+    pdfx.PDFx(fn, cache=cache_dir, max_text_bytes=max_text_bytes).get_text()
+    with open(fn, "wb") as f:
+        f.write(append_update(data, 7, b"<< /Length 5 >>\nstream\nBT ET\nendstream"))
+    pdf = pdfx.PDFx(fn, cache=cache_dir, max_text_bytes=max_text_bytes)
+    assert pdf.get_text() == pdfx.PDFx(fn, max_text_bytes=max_text_bytes).get_text()
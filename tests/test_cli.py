@@ -12,3 +12,11 @@ def test_cli():
     parsed = parser.parse_args(['-j', 'pdfs/valid.pdf'])
     assert parsed.json
     assert parsed.pdf == "pdfs/valid.pdf"
+
+
+def test_cli_batch():
+    parser = cli.create_parser()
+    parsed = parser.parse_args(['--jobs', '4', '--batch', 'pdfs/', '-'])
+    assert parsed.batch == ["pdfs/", "-"]
+    assert parsed.jobs == 4
+    assert parsed.pdf is None
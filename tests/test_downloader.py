@@ -0,0 +1,51 @@
+from __future__ import absolute_import, division, print_function
+
+import os
+from pdfx.downloader import (
+    download_url,
+    format_size,
+    interleave_by_host,
+    get_default_engine,
+)
+
+curdir = os.path.dirname(os.path.realpath(__file__))
+
+
+def test_download_url(http_server, tmpdir):
+    fn = download_url(http_server.url + "/i14doc2.pdf", str(tmpdir))
+    assert fn == str(tmpdir.join("i14doc2.pdf"))
+    assert http_server.requests == [("/i14doc2.pdf", 200)]
+    with open(os.path.join(curdir, "pdfs/i14doc2.pdf"), "rb") as f1, open(fn, "rb") as f2:
+        assert f1.read() == f2.read()
+
+    # No partial files are left behind
+    assert download_url(http_server.url + "/404.pdf", str(tmpdir)) is None
+    assert [f.basename for f in tmpdir.listdir()] == ["i14doc2.pdf"]
+
+
+def test_format_size():
+    assert format_size(100) == "100 bytes"
+    assert format_size(1536) == "1.5 KB"
+    assert format_size(3 * 1024 * 1024) == "3.0 MB"
+
+
+def test_interleave_by_host():
+    urls = ["a.com/1", "http://a.com/2", "https://b.org/1", "a.com/3", "c.net/1", "b.org/2"]
+    assert interleave_by_host(urls) == [
+        "a.com/1",
+        "https://b.org/1",
+        "c.net/1",
+        "http://a.com/2",
+        "b.org/2",
+        "a.com/3",
+    ]
+    assert interleave_by_host([]) == []
+
+
+def test_default_engine(monkeypatch):
+    for name in ("http_proxy", "https_proxy", "HTTP_PROXY", "HTTPS_PROXY"):
+        monkeypatch.delenv(name, raising=False)
+    assert get_default_engine() == "async"
+    # The async client does not support proxies
+    monkeypatch.setenv("https_proxy", "http://proxy.example.com:3128")
+    assert get_default_engine() == "threads"
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import re
+import pickle
+import random
+
+import pdfx
+from pdfx import extractor
+from pdfx.extractor import extract_references, extract_urls, Match
+from pdfx.backends import Reference, extract_references as extract_reference_set
+
+curdir = os.path.dirname(os.path.realpath(__file__))
+
+TEXT = (
+    "See arXiv:1501.00001, arxiv.org/abs/1502.00002. DOI: 10.1145/2810103.2813707. "
+    "DOI: http://dx.doi.org/10.1/x http://example.com/a.pdf (www.test.org/x?y=1)"
+)
+
+
+def test_extract_references():
+    matches = list(extract_references(TEXT))
+    assert matches == [
+        Match("arxiv", "1501.00001", 10, 20),
+        Match("arxiv", "1502.00002", 36, 46),
+        Match("doi", "10.1145/2810103.2813707", 53, 76),
+        Match("url", "http://dx.doi.org/10.1/x", 83, 107),
+        Match("url", "http://example.com/a.pdf", 108, 132),
+        Match("url", "www.test.org/x?y=1", 134, 152),
+    ]
+    for match in matches:
+        assert TEXT[match.start : match.end] == match.ref  # noqa: E203
+    # Urls which are arxiv links are matched as arxiv ids
+    urls = set(m.ref for m in matches if m.reftype == "url")
+    assert urls == extract_urls(TEXT) - set(["arxiv.org/abs/1502.00002"])
+
+
+def test_reference_types():
+    refs = dict((ref.ref, ref.reftype) for ref in extract_reference_set(TEXT))
+    assert refs == {
+        "1501.00001": "arxiv",
+        "1502.00002": "arxiv",
+        "10.1145/2810103.2813707": "doi",
+        "http://dx.doi.org/10.1/x": "url",
+        "http://example.com/a.pdf": "pdf",
+        "www.test.org/x?y=1": "url",
+    }
+
+
+def get_corpus():
+    """ Texts of the test PDFs, and random texts of url-like pieces """
+    texts = [pdfx.PDFx(os.path.join(curdir, "pdfs", fn)).get_text() for fn in ("valid.pdf",)]
+    pieces = (
+        ["http", "https", ":", "//", "/", ".", "com", "org", "Ja", "www", "ex", ".pdf"]
+        + ["arxiv", "DOI", "abs", "(", ")", "@", ",", "-", "?", "=", "1", "a", "\u017f", "\xab"]
+        + [" ", "\n", "\f", "\xa0", "\u2003", "\x1c", "\u200b"]
+    )
+    rnd = random.Random(0)
+    for _ in range(3000):
+        texts.append("".join(rnd.choice(pieces) for _ in range(rnd.randint(0, 40))))
+    return texts
+
+
+def test_prefiltered_matching():
+    # The single pass with prefilter gives the same result as the full
+    # regexes at every position
+    reference_pattern = re.compile(
+        "|".join(
+            [
+                extractor.ARXIV_REGEX.replace("(", "(?P<arxiv>", 1),
+                extractor.ARXIV_REGEX2.replace("(", "(?P<arxiv2>", 1),
+                extractor.DOI_REGEX.replace("(", "(?P<doi>", 1),
+                extractor.URL_NAMED_REGEX,
+            ]
+        ),
+        re.IGNORECASE,
+    )
+    for text in get_corpus():
+        urls = [m.span() for m in re.finditer(extractor.URL_REGEX, text)]
+        assert [m.span() for m in extractor.iter_urls(text)] == urls
+        assert extract_urls(text) == set(re.findall(extractor.URL_REGEX, text))
+
+        matches = (extractor.make_match(m) for m in reference_pattern.finditer(text))
+        assert list(extract_references(text)) == [m for m in matches if m]
+
+
+def test_reference():
+    assert Reference("http://a.com/x.PDF?dl=1").reftype == "pdf"
+    ref = Reference("https://arxiv.org/abs/1501.00001", 3)
+    assert (ref.ref, ref.reftype, ref.page) == ("1501.00001", "arxiv", 3)
+    assert Reference("http://a.com/DOI:10.1/x").reftype == "doi"
+    assert Reference("1501.00001", reftype="arxiv") == ref
+    assert not hasattr(ref, "__dict__")
+    assert pickle.loads(pickle.dumps(ref, 2)).page == 3
+    assert sorted([Reference("b.com"), Reference("a.pdf"), Reference("a.com")]) == [
+        Reference("a.pdf"),
+        Reference("a.com"),
+        Reference("b.com"),
+    ]
@@ -0,0 +1,23 @@
+from __future__ import absolute_import, division, print_function
+
+import os
+import pdfx
+from pdfx.downloader import download_urls
+
+curdir = os.path.dirname(os.path.realpath(__file__))
+
+
+def test_http_cache(http_server, tmpdir):
+    url = http_server.url + "/i14doc1.pdf"
+    cache_dir = str(tmpdir.join("cache"))
+    pdf = pdfx.PDFx(url, http_cache=cache_dir)
+    pdf_cached = pdfx.PDFx(url, http_cache=cache_dir)
+    assert http_server.requests == [("/i14doc1.pdf", 200), ("/i14doc1.pdf", 304)]
+    assert pdf_cached.get_references() == pdf.get_references()
+
+    download_dir = str(tmpdir.join("download"))
+    download_urls([url], download_dir, http_cache=pdf.http_cache)
+    assert http_server.requests[-1] == ("/i14doc1.pdf", 304)
+    with open(os.path.join(curdir, "pdfs/i14doc1.pdf"), "rb") as f1:
+        with open(os.path.join(download_dir, "i14doc1.pdf"), "rb") as f2:
+            assert f1.read() == f2.read()
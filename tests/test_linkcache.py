@@ -0,0 +1,35 @@
+from __future__ import absolute_import, division, print_function
+
+import time
+from pdfx.backends import Reference
+from pdfx.downloader import check_refs
+from pdfx.linkcache import LinkCache
+
+
+def test_link_cache(tmpdir):
+    fn = str(tmpdir.join("links.sqlite"))
+    with LinkCache(fn, ttl_success=100, ttl_failure=100) as cache:
+        assert cache.get("http://a.com") is None
+        cache.put("http://a.com", 200, "https://a.com/")
+        cache.put("http://b.com", "timed out")
+        assert cache.get("http://a.com") == ("200", "https://a.com/")
+
+    # Persistent, and separate TTLs for success and failure
+    with LinkCache(fn, ttl_success=100, ttl_failure=0) as cache:
+        time.sleep(0.01)
+        assert cache.get("http://a.com") == ("200", "https://a.com/")
+        assert cache.get("http://b.com") is None
+
+
+def test_check_refs_cached(http_server, tmpdir):
+    refs = [Reference(http_server.url + "/valid.pdf"), Reference(http_server.url + "/x.pdf")]
+    for engine in ("async", "threads"):
+        http_server.requests[:] = []
+        with LinkCache(str(tmpdir.join(engine + ".sqlite"))) as cache:
+            check_refs(refs, verbose=False, engine=engine, link_cache=cache)
+            assert len(http_server.requests) == 2
+            assert cache.get(refs[0].ref) == ("200", refs[0].ref)
+            assert cache.get(refs[1].ref) == ("404", refs[1].ref)
+
+            check_refs(refs, verbose=False, engine=engine, link_cache=cache)
+            assert len(http_server.requests) == 2
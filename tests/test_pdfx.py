@@ -1,8 +1,12 @@
-from __future__ import absolute_import, division, print_function
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
 
 import os
+from io import BytesIO
 import pdfx
 import pytest
+from pdfx.backends import PDFMinerBackend
+from pdfx.stats import Stats
 
 curdir = os.path.dirname(os.path.realpath(__file__))
 
@@ -28,3 +32,143 @@ def test_two_pdfs():
     pdfx.PDFx(os.path.join(curdir, "pdfs/i14doc1.pdf"))
     pdf_2 = pdfx.PDFx(os.path.join(curdir, "pdfs/i14doc2.pdf"))
     assert len(pdf_2.get_references()) == 2
+
+
+def test_lazy_parsing():
+    pdf = pdfx.PDFx(os.path.join(curdir, "pdfs/valid.pdf"))
+    metadata = pdf.get_metadata()
+    assert metadata["Pages"] == 13
+    assert not pdf.reader.content_parsed
+
+    assert len(pdf.summary["references"]["pdf"]) == 18
+    assert pdf.reader.content_parsed
+
+
+def test_read_metadata(tmpdir, monkeypatch):
+    def process_page(self, page):
+        raise AssertionError("page %s interpreted" % page.pageid)
+
+    monkeypatch.setattr(pdfx.backends.PDFPageInterpreter, "process_page", process_page)
+    fn = os.path.join(curdir, "pdfs/valid.pdf")
+    metadata = pdfx.read_metadata(fn, cache=str(tmpdir))
+    assert metadata["Pages"] == 13
+    assert metadata == pdfx.PDFx(fn).get_metadata()
+    assert not tmpdir.listdir()
+
+
+def test_make_compat_str():
+    make_compat_str = pdfx.backends.make_compat_str
+    assert make_compat_str(b"") == ""
+    assert make_compat_str(b"pdfTeX-1.40.14") == "pdfTeX-1.40.14"
+    assert make_compat_str(b"\xfe\xff" + "Grüße".encode("utf-16-be")) == "Grüße"
+    assert make_compat_str(b"\xef\xbb\xbf" + "Grüße".encode("utf-8")) == "Grüße"
+    assert make_compat_str("Grüße".encode("utf-8")) == "Grüße"
+    # Ambiguous 8-bit strings are detected by chardet
+    text = "Привет мир, это тест"
+    assert make_compat_str(text.encode("cp1251")) == text
+
+
+def test_budgets():
+    fn = os.path.join(curdir, "pdfs/valid.pdf")
+    text = pdfx.PDFx(fn).get_text()
+
+    pdf = pdfx.PDFx(fn, max_pages=2)
+    assert pdf.summary["truncated"] == "max_pages"
+    assert len(pdf.reader.pages) == 2
+    assert text.startswith(pdf.get_text())
+
+    pdf = pdfx.PDFx(fn, max_text_bytes=1000)
+    assert pdf.summary["truncated"] == "max_text_bytes"
+    assert len(pdf.get_text().encode("utf-8")) == 1000
+    assert text.startswith(pdf.get_text())
+
+    # Stopped in the first page
+    pdf = pdfx.PDFx(fn, timeout=0.000001)
+    assert pdf.summary["truncated"] == "timeout"
+    assert pdf.get_text() == ""
+
+    # The workers check the memory budget (not only the parent process)
+    pdf = pdfx.PDFx(fn, jobs=2, max_memory=1)
+    assert pdf.summary["truncated"] == "max_memory"
+    assert pdf.get_text() == ""
+
+    pdf = pdfx.PDFx(fn, max_pages=20, timeout=60)
+    assert "truncated" not in pdf.summary
+    assert pdf.get_text() == text
+
+
+def test_stats():
+    fn = os.path.join(curdir, "pdfs/valid.pdf")
+    timings = []
+    stats = Stats(callback=lambda stage, seconds: timings.append(stage))
+    pdf = pdfx.PDFx(fn, stats=stats)
+    pdf.get_references()
+    assert pdf.summary["stats"]["counts"]["pages"] == 13
+    assert [page["page"] for page in stats.pages] == list(range(1, 14))
+    for stage in ("parse", "metadata.info", "pages.interpret", "references.regex"):
+        assert stage in stats.stages
+        assert stage in timings
+    assert pdf.summary["stats"]["counts"]["references"] == len(pdf.get_references())
+
+    pdf = pdfx.PDFx(fn, stats=Stats(pages=False))
+    assert "pages" not in pdf.summary["stats"]
+    assert pdfx.PDFx(fn).stats is None
+
+
+def test_parallel_pages():
+    fn = os.path.join(curdir, "pdfs/valid.pdf")
+    pdf = pdfx.PDFx(fn)
+    pdf_parallel = pdfx.PDFx(fn, jobs=3)
+    assert pdf_parallel.get_text() == pdf.get_text()
+    assert pdf_parallel.get_references() == pdf.get_references()
+
+    # From the content instead of a filename
+    with open(fn, "rb") as f:
+        content = f.read()
+    backend = PDFMinerBackend(BytesIO(content), jobs=3, source=content)
+    assert backend.get_text() == pdf.get_text()
+
+
+def test_layout_none():
+    fn = os.path.join(curdir, "pdfs/valid.pdf")
+    pdf = pdfx.PDFx(fn, layout="none")
+    assert "Imperfect Forward Secrecy" in pdf.get_text()
+    assert pdf.get_references() == pdfx.PDFx(fn).get_references()
+
+
+def test_iter_pages():
+    pdf = pdfx.PDFx(os.path.join(curdir, "pdfs/valid.pdf"))
+    pages = list(pdf.iter_pages())
+    assert [page.page for page in pages] == list(range(1, 14))
+    assert "".join(page.text for page in pages) == pdf.get_text()
+
+    refs = set()
+    for page in pages:
+        refs |= page.get_references()
+    assert refs == pdf.get_references()
+
+
+def test_reference_locations():
+    pdf = pdfx.PDFx(os.path.join(curdir, "pdfs/valid.pdf"))
+    texts = dict((page.page, page.text) for page in pdf.iter_pages())
+    for ref in pdf.get_references():
+        if ref.bbox is None:
+            # Text reference: found at its offset in the text of its page
+            assert texts[ref.page].find(ref.ref) == ref.offset
+        else:
+            # Annotation reference
+            assert ref.offset is None
+            x0, y0, x1, y1 = ref.bbox
+            assert x0 <= x1 and y0 <= y1
+    pages = dict((ref.ref, ref.page) for ref in pdf.get_references())
+    assert pages["sohu.com"] == 11
+    assert pages["http://www.spiegel.de/international/germany/"] == 13
+
+
+def test_download_pdfs_copies_original(tmpdir):
+    fn = os.path.join(curdir, "pdfs/i14doc1.pdf")
+    pdf = pdfx.PDFx(fn)
+    pdf.download_pdfs(str(tmpdir))
+    with open(fn, "rb") as f1, open(str(tmpdir.join("i14doc1.pdf")), "rb") as f2:
+        assert f1.read() == f2.read()
+    assert tmpdir.join("i14doc1.pdf.infos.json").check()
@@ -0,0 +1,134 @@
+from __future__ import absolute_import, division, print_function
+
+import os
+import json
+import signal
+import time
+import threading
+import multiprocessing
+import pytest
+
+import pdfx
+
+server = pytest.importorskip("pdfx.server")
+
+try:
+    from urllib.request import urlopen, HTTPError
+except ImportError:
+    from urllib2 import urlopen, HTTPError
+
+curdir = os.path.dirname(os.path.realpath(__file__))
+
+
+@pytest.fixture
+def extraction_server():
+    httpd = server.ExtractionServer(("127.0.0.1", 0), workers=1, max_queue=0, timeout=30)
+    httpd.url = "http://127.0.0.1:%s" % httpd.server_address[1]
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def post(url, data):
+    try:
+        response = urlopen(url, data)
+    except HTTPError as e:
+        response = e
+    return response.code, json.loads(response.read().decode("utf-8"))
+
+
+def wait_until_idle(httpd, timeout=5):
+    """ Waits until no request is pending """
+    deadline = time.time() + timeout
+    while httpd.pending and time.time() < deadline:
+        time.sleep(0.01)
+    assert httpd.pending == 0
+
+
+def test_extract(extraction_server):
+    fn = os.path.join(curdir, "pdfs/i14doc2.pdf")
+    expected = pdfx.PDFx(fn).summary
+
+    with open(fn, "rb") as f:
+        status, result = post(extraction_server.url + "/extract", f.read())
+    assert status == 200
+    assert result["source"]["type"] == "upload"
+    assert result["metadata"] == expected["metadata"]
+    assert result["references"] == expected["references"]
+
+    status, result = post(extraction_server.url + "/extract", json.dumps({"path": fn}).encode())
+    assert status == 200
+    assert result == json.loads(json.dumps(expected))
+
+    status, result = post(extraction_server.url + "/extract", b'{"path": "missing.pdf"}')
+    assert status == 404
+    assert post(extraction_server.url + "/extract", b"invalid")[0] == 400
+
+    health = json.loads(urlopen(extraction_server.url + "/health").read().decode("utf-8"))
+    assert health == {"status": "ok", "workers": 1, "pending": 0}
+
+
+def test_queue_full_and_timeout(extraction_server):
+    data = json.dumps({"path": os.path.join(curdir, "pdfs/valid.pdf")}).encode()
+
+    extraction_server.pending = 1
+    assert post(extraction_server.url + "/extract", data)[0] == 503
+    # Uploads are rejected before they are read
+    extraction_server.save_upload = None
+    with open(os.path.join(curdir, "pdfs/i14doc2.pdf"), "rb") as f:
+        assert post(extraction_server.url + "/extract", f.read())[0] == 503
+    del extraction_server.save_upload
+
+    extraction_server.pending = 0
+    extraction_server.timeout = 0.01
+    t = time.time()
+    assert post(extraction_server.url + "/extract", data)[0] == 504
+    # The worker stops at the deadline, much before the PDF is processed
+    wait_until_idle(extraction_server)
+    assert time.time() - t < 1
+
+
+def test_cancel_queued(extraction_server):
+    data = json.dumps({"path": os.path.join(curdir, "pdfs/valid.pdf")}).encode()
+    extraction_server.max_queue = 2
+    extraction_server.timeout = 0.5
+    threads = [
+        threading.Thread(target=post, args=(extraction_server.url + "/extract", data))
+        for _ in range(3)
+    ]
+    t = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # The queued requests are not processed after their 504
+    wait_until_idle(extraction_server)
+    assert time.time() - t < 2
+
+
+def test_worker_died(extraction_server):
+    fn = os.path.join(curdir, "pdfs/valid.pdf")
+    data = json.dumps({"path": fn}).encode()
+    uploads = []
+    save_upload = extraction_server.save_upload
+    extraction_server.save_upload = lambda *args: uploads.append(save_upload(*args)) or uploads[-1]
+
+    def kill_workers():
+        while extraction_server.pending == 0:
+            time.sleep(0.01)
+        for process in multiprocessing.active_children():
+            os.kill(process.pid, signal.SIGKILL)
+
+    thread = threading.Thread(target=kill_workers)
+    thread.start()
+    with open(fn, "rb") as f:
+        assert post(extraction_server.url + "/extract", f.read())[0] == 500
+    thread.join()
+
+    # The request slot is freed and the upload removed, and the workers are restarted
+    wait_until_idle(extraction_server)
+    assert not os.path.exists(uploads[0])
+    assert post(extraction_server.url + "/extract", data)[0] == 200
@@ -0,0 +1,28 @@
+from __future__ import absolute_import, division, print_function
+
+import os
+import pdfx
+import pytest
+from pdfx.sources import open_url
+
+curdir = os.path.dirname(os.path.realpath(__file__))
+
+
+def test_open_url(http_server):
+    stream = open_url(http_server.url + "/i14doc1.pdf", max_memory=1024)
+    with open(os.path.join(curdir, "pdfs/i14doc1.pdf"), "rb") as f:
+        assert stream.read() == f.read()
+
+    with pytest.raises(pdfx.exceptions.DownloadError):
+        open_url(http_server.url + "/i14doc1.pdf", max_size=1024)
+
+    with pytest.raises(pdfx.exceptions.PDFInvalidError):
+        open_url(http_server.url + "/invalid.pdf")
+
+
+def test_pdfx_url(http_server):
+    pdf = pdfx.PDFx(http_server.url + "/i14doc2.pdf", jobs=2)
+    # The workers open the download from disk
+    assert os.path.getsize(pdf.source) == os.path.getsize(os.path.join(curdir, "pdfs/i14doc2.pdf"))
+    assert len(pdf.get_references()) == 2
+    assert pdf.summary["source"]["type"] == "url"
@@ -0,0 +1,49 @@
+from __future__ import absolute_import, division, print_function
+
+import sys
+import subprocess
+import pytest
+
+import pdfx
+
+# Modules which `import pdfx` and `import pdfx.cli` must not import
+HEAVY_MODULES = ["pdfminer", "chardet", "ssl", "sqlite3", "urllib.request", "asyncio"]
+
+# Budget for `import pdfx.cli` (it took about 160 ms with eager imports)
+IMPORT_BUDGET_MS = 100
+
+# Imports are only deferred with module __getattr__ (PEP 562), and
+# `-X importtime` is new in Python 3.7
+requires_py37 = pytest.mark.skipif(
+    sys.version_info < (3, 7), reason="Imports are eager before Python 3.7"
+)
+
+
+def run_python(*args):
+    return subprocess.check_output(
+        [sys.executable] + list(args), stderr=subprocess.STDOUT
+    ).decode("utf-8")
+
+
+@requires_py37
+def test_lazy_imports():
+    out = run_python("-c", "import sys, pdfx.cli; print(' '.join(sys.modules))")
+    modules = set(out.split())
+    for name in HEAVY_MODULES:
+        assert name not in modules
+
+
+def test_lazy_names():
+    # Names of earlier versions are still available
+    assert pdfx.PDFMinerBackend is pdfx.backends.PDFMinerBackend
+    assert pdfx.extract_urls("see https://example.com/a.pdf")
+
+
+@requires_py37
+def test_import_time():
+    def import_time():
+        out = run_python("-X", "importtime", "-c", "import pdfx.cli")
+        line = [line for line in out.splitlines() if line.endswith("| pdfx.cli")][0]
+        return int(line.split("|")[1]) / 1000
+
+    assert min(import_time() for _ in range(3)) < IMPORT_BUDGET_MS
@@ -0,0 +1,77 @@
+from __future__ import absolute_import, division, print_function
+
+import time
+import threading
+from pdfx.threadpool import BoundedExecutor, ThreadPool, TaskTimeoutError
+
+
+def test_executor_results():
+    def square(x):
+        if x == 3:
+            raise ValueError("no 3")
+        return x * x
+
+    with BoundedExecutor(2) as executor:
+        results = dict((item, (res, err)) for item, res, err in executor.map(square, range(5)))
+    assert [results[i][0] for i in (0, 1, 2, 4)] == [0, 1, 4, 16]
+    assert isinstance(results[3][1], ValueError)
+
+
+def test_executor_max_threads():
+    running = []
+    lock = threading.Lock()
+
+    def task(x):
+        with lock:
+            running.append(threading.current_thread().name)
+        time.sleep(0.01)
+
+    with BoundedExecutor(3) as executor:
+        list(executor.map(task, range(20)))
+    assert len(set(running)) <= 3
+
+
+def test_executor_timeouts():
+    event = threading.Event()
+
+    # Hanging tasks are reported as timed out, without waiting for them
+    executor = BoundedExecutor(2)
+    t = time.time()
+    results = list(executor.map(lambda x: x if x else event.wait(5), range(3), task_timeout=0.2))
+    assert time.time() - t < 2
+    assert sorted((item, type(error)) for item, result, error in results) == [
+        (0, TaskTimeoutError),
+        (1, type(None)),
+        (2, type(None)),
+    ]
+
+    # Overall deadline: the running task times out, the waiting one is cancelled
+    executor = BoundedExecutor(1)
+    t = time.time()
+    results = list(executor.map(lambda x: event.wait(5), range(2), timeout=0.2))
+    assert time.time() - t < 2
+    assert [type(error) for item, result, error in results] == [TaskTimeoutError] * 2
+    event.set()
+    executor.shutdown()
+
+
+def test_executor_with_abandoned_task():
+    event = threading.Event()
+
+    # Leaving the with block does not wait for the timed out task
+    t = time.time()
+    with BoundedExecutor(2) as executor:
+        results = list(
+            executor.map(lambda x: x if x else event.wait(5), range(3), task_timeout=0.2)
+        )
+    assert time.time() - t < 2
+    assert [item for item, result, error in results if error is not None] == [0]
+    event.set()
+
+
+def test_threadpool_compat():
+    results = []
+    pool = ThreadPool(3)
+    pool.map(results.append, range(10))
+    pool.wait_completion()
+    assert sorted(results) == list(range(10))